@@ -1,38 +1,258 @@
 #!/usr/bin/env python3
+import argparse
+import contextlib
+import cProfile
+import hashlib
 import os
+import tracemalloc
+
+import TriggerSystemCache
+import TriggerSystemProfile
+import TriggerSystemShard
+import TriggerSystemSnapshot
+import TriggerSystemTemplates
+import TriggerSystemUsage
+from TriggerSystemMerge import iter_merged, iter_model_parts, iter_shard_output, layout_key, merged_kinds
+from TriggerSystemParser import API_FILE, build_model, load_blacklist, model_from_classes, open_api, source_date_epoch
+from TriggerSystemProfile import stage
 
-INPUT_GEN = "TriggerSystemInput_Gen.py"
-OUTPUT_GEN = "TriggerSystemOutput_Gen.py"
-INPUT_FILE = "InputTriggerAPI.verse"
-OUTPUT_FILE = "OutputTriggerAPI.verse"
 MERGED_FILE = "TriggerSystemAPI.verse"
+WRITE_BUFFER = 1 << 16
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the combined trigger system API.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"ignore and do not update the {TriggerSystemCache.CACHE_DIR} cache or the digest snapshot")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="parse top-level digest modules in N worker processes")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-stable output: sorted devices, timestamp only from SOURCE_DATE_EPOCH")
+    parser.add_argument("--batched", action="store_true",
+                        help="also emit array-target output triggers and fan-in input listeners")
+    parser.add_argument("--usage", metavar="PROJECT_DIR",
+                        help="tree-shake: only emit wrappers for devices the .verse files under PROJECT_DIR use")
+    parser.add_argument("--shard", choices=TriggerSystemShard.SHARD_MODES,
+                        help="write one file per device or per digest module plus a shared base file, "
+                             "instead of one merged file; unchanged shards are not rewritten")
+    parser.add_argument("--shard-dir", default=TriggerSystemShard.SHARD_DIR, metavar="DIR",
+                        help=f"directory for --shard output (default {TriggerSystemShard.SHARD_DIR})")
+    parser.add_argument("--profile", action="store_true",
+                        help="print wall/CPU time, allocations and regex calls per stage")
+    parser.add_argument("--profile-json", metavar="FILE", help="also write the per-stage profile as JSON")
+    parser.add_argument("--cprofile", metavar="FILE", help="dump cProfile stats of the run (implies --profile)")
+    parser.add_argument("--tracemalloc", metavar="FILE",
+                        help="trace memory, add peak KiB per stage and dump a snapshot (implies --profile)")
+    return parser.parse_args(argv)
+
+def stream_to_file(path, chunks):
+    """
+    Write chunks through one buffered writer and swap the file in atomically.
+
+    Returns (written, content hash); a file that already holds the same
+    content is left untouched.
+    """
+    tmp = path + ".tmp"
+    h = hashlib.sha256()
+    chunks = iter(chunks)
+    try:
+        with open(tmp, "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+            while True:
+                # Sections are rendered lazily, as the writer pulls them
+                with stage("render"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                with stage("write"):
+                    h.update(chunk.encode("utf-8"))
+                    f.write(chunk)
+    except BaseException:
+        # open() itself may have failed before the file existed
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+    with stage("write"):
+        digest = h.hexdigest()
+        unchanged = os.path.exists(path) and TriggerSystemCache.file_hash(path) == digest
+        if unchanged:
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+
+    return not unchanged, digest
+
+def scan_usage(project, save=True):
+    """
+    Bring the project's usage index up to date; returns the index
+    """
+    with stage("usage"):
+        index = TriggerSystemUsage.UsageIndex.load(project)
+        rescanned = index.scan()
+        if save and index.stale:
+            index.save()
+    print(f"Scanned {len(index.files)} .verse file(s) under {os.path.abspath(project)}, {rescanned} changed.")
+    return index
+
+def report_shaken(model, shaken, size, lines, full):
+    """
+    Print how much smaller the tree-shaken output is than the full one; full is (bytes, lines)
+    """
+    full_size, full_lines = full
+    kept = len(shaken["device_classes"])
+    print(f"Tree-shaken to {kept} of {len(model['device_classes'])} device(s): "
+          f"{full_size:,} -> {size:,} bytes (-{TriggerSystemUsage.reduction(full_size, size):.1f}%), "
+          f"{full_lines:,} -> {lines:,} lines (-{TriggerSystemUsage.reduction(full_lines, lines):.1f}%)")
+
+def section_key(kind):
+    """
+    Cache key of one kind's rendered sections; a changed template renders them again
+    """
+    return f"{kind.name}:{kind.fingerprint}"
+
+def generate_api(args):
+    with stage("load"):
+        input_file = open_api(API_FILE)
+
+    with stage("blacklist"):
+        blacklist = load_blacklist()
+    if blacklist:
+        print(f"Loaded {len(blacklist)} blacklisted device(s).")
+
+    # Everything besides digest and blacklist that changes the written bytes
+    kinds = merged_kinds(args.batched)
+    # Kinds may be registered outside the hashed generator sources, so the layout is keyed here
+    options = (f"deterministic={args.deterministic}", f"epoch={os.environ.get('SOURCE_DATE_EPOCH', '')}",
+               f"layout={layout_key(kinds)}", f"shard={args.shard}")
+    # Sharded output is current when its index is; the index holds every shard's hash
+    target = os.path.join(args.shard_dir, TriggerSystemShard.INDEX_FILE) if args.shard else MERGED_FILE
+
+    usage = None
+    if args.usage:
+        # Any edit to the project's sources may change which devices are kept
+        usage = scan_usage(args.usage, save=not args.no_cache)
+        options += (f"usage={usage.fingerprint()}",)
+
+    entry = None
+    if not args.no_cache:
+        with stage("cache"):
+            key = TriggerSystemCache.digest_key(input_file)
+            entry = TriggerSystemCache.load_entry(key)
+            current = entry and TriggerSystemCache.is_current(entry, blacklist, target, options)
+            # The index alone does not notice a deleted or truncated shard
+            if current and args.shard:
+                current = TriggerSystemShard.shards_intact(args.shard_dir)
+        if current:
+            print(f"Up to date: {os.path.abspath(target)}")
+            return
+
+    # Parse the digest once and feed the same model to both generators
+    if entry:
+        model = model_from_classes(entry["classes"], entry["build_id"])
+    elif args.no_cache:
+        model = build_model(input_file, jobs=args.jobs)
+    else:
+        # A current snapshot skips parsing, e.g. after a generator-only change
+        model, _ = TriggerSystemSnapshot.load_model(input_file, API_FILE, jobs=args.jobs)
+    print(f"Found {len(model['devices'])} device(s).")
+
+    sections = None
+    if not args.no_cache:
+        if not entry:
+            entry = TriggerSystemCache.new_entry(key, model, {})
+        # Render every device once per kind; blacklist changes then only re-filter
+        # cached sections, and --batched only adds the kinds it has not seen yet
+        cached = entry["sections"]
+        with stage("render"):
+            for kind, _ in kinds:
+                if section_key(kind) not in cached:
+                    cached[section_key(kind)] = TriggerSystemTemplates.render_sections(
+                        kind, model["device_classes"], model["hierarchy"])
+        sections = [cached[section_key(kind)] for kind, _ in kinds]
+
+    # Tree-shaking only narrows the devices; the cached sections cover all of them
+    out_model = model
+    if usage:
+        with stage("usage"):
+            used = TriggerSystemUsage.used_devices(model, usage.tokens())
+            out_model = TriggerSystemUsage.shake_model(model, used)
+
+    if args.shard:
+        shards = iter_shard_output(out_model, blacklist, args.shard, sections, args.deterministic, kinds)
+        with stage("write"):
+            stats = TriggerSystemShard.write_shards(args.shard_dir, shards, model["build_id"], args.shard)
+        merged_hash = stats["hash"]
+        print(f"Sharded API in: {os.path.abspath(args.shard_dir)} ({stats['written']} written, "
+              f"{stats['unchanged']} unchanged, {stats['removed']} removed)")
+        size, lines = stats["bytes"], stats["lines"]
+    else:
+        # Device sections go straight into the merged file; an identical file is
+        # left untouched so UEFN does not recompile it
+        parts = iter_model_parts(out_model, blacklist, sections, args.deterministic, kinds)
+        merged = iter_merged(*parts, kinds=kinds, build_id=model["build_id"], deterministic=args.deterministic)
+        written, merged_hash = stream_to_file(MERGED_FILE, merged)
+        if written:
+            print(f"Combined API written to: {os.path.abspath(MERGED_FILE)}")
+        else:
+            print(f"Combined API unchanged: {os.path.abspath(MERGED_FILE)}")
+
+    if usage:
+        # Measure what the full output would have been, without writing it
+        with stage("usage"):
+            if args.shard:
+                full = iter_shard_output(model, blacklist, args.shard, sections, args.deterministic, kinds,
+                                         report_skipped=False)
+                measured = [TriggerSystemUsage.measure([text]) for _, _, text in full]
+                full = (sum(m[0] for m in measured), sum(m[1] for m in measured))
+            else:
+                with open(MERGED_FILE, "r", encoding="utf-8") as f:
+                    size, lines = TriggerSystemUsage.measure(f)
+                full = iter_model_parts(model, blacklist, sections, args.deterministic, kinds, report_skipped=False)
+                full = TriggerSystemUsage.measure(iter_merged(*full, kinds=kinds, build_id=model["build_id"],
+                                                              deterministic=args.deterministic))
+        report_shaken(model, out_model, size, lines, full)
+
+    if entry:
+        with stage("cache"):
+            TriggerSystemCache.record_output(entry, blacklist, merged_hash, options)
+            TriggerSystemCache.store_entry(entry)
+
+def check_environment():
+    """
+    Fail before any work when SOURCE_DATE_EPOCH cannot be used for the headers
+    """
+    try:
+        source_date_epoch()
+    except ValueError as e:
+        raise SystemExit(str(e)) from None
+
+def main(argv=None):
+    args = parse_args(argv)
+    check_environment()
+
+    if not (args.profile or args.profile_json or args.cprofile or args.tracemalloc):
+        generate_api(args)
+        return
+
+    profiler = TriggerSystemProfile.enable(trace_memory=bool(args.tracemalloc))
+    cprof = cProfile.Profile() if args.cprofile else None
+    try:
+        if cprof:
+            cprof.enable()
+        generate_api(args)
+    finally:
+        if cprof:
+            cprof.disable()
+            cprof.dump_stats(args.cprofile)
+            print(f"cProfile stats written to: {os.path.abspath(args.cprofile)}")
+        if args.tracemalloc:
+            tracemalloc.take_snapshot().dump(args.tracemalloc)
+            print(f"tracemalloc snapshot written to: {os.path.abspath(args.tracemalloc)}")
+        TriggerSystemProfile.disable()
 
-def run_script(script):
-    code = os.system(f"python {script}")
-    if code != 0:
-        raise RuntimeError(f"Failed to run {script}")
-
-def read_file(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
-
-def main():
-    run_script(INPUT_GEN)
-    run_script(OUTPUT_GEN)
-    input_content = read_file(INPUT_FILE)
-    output_content = read_file(OUTPUT_FILE)
-    with open(MERGED_FILE, "w", encoding="utf-8") as f:
-        f.write(input_content.strip())
-        f.write("\n\n# === OUTPUT API ===\n\n")
-        f.write(output_content.strip())
-    # Remove raw API files
-    for raw in (INPUT_FILE, OUTPUT_FILE):
-        try:
-            os.remove(raw)
-            print(f"Deleted: {raw}")
-        except Exception as e:
-            print(f"Warning: Could not delete {raw}: {e}")
-    print(f"Combined API written to: {os.path.abspath(MERGED_FILE)}")
+    print(profiler.format_table())
+    if args.profile_json:
+        profiler.write_json(args.profile_json)
+        print(f"Profile written to: {os.path.abspath(args.profile_json)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Generate one TriggerSystemAPI.<build>.verse per digest in a directory."""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from GenerateCompleteAPI import check_environment, stream_to_file
+from TriggerSystemMerge import iter_merged, iter_model_parts, merged_kinds
+from TriggerSystemParser import (
+    build_tag,
+    extract_build_id,
+    extract_classes,
+    load_blacklist,
+    model_from_classes,
+    open_api,
+)
+
+DIGEST_PATTERN = "*.digest.verse"
+
+
+def parse_digest(path):
+    """
+    Parse one digest; runs in a worker process and returns plain data
+    """
+    t0 = time.perf_counter()
+    data = open_api(path)
+    build_id = extract_build_id(data)
+    classes = {name: dict(entry) for name, entry in extract_classes(data).items()}
+    return path, build_id, classes, time.perf_counter() - t0
+
+
+def output_path(out_dir, build_id, digest_path, used):
+    tag = build_tag(build_id)
+    if build_id == "unknown" or tag in used:
+        # Fall back to the digest file name so builds never overwrite each other
+        tag = f"{tag}.{os.path.basename(digest_path).split('.', 1)[0]}"
+    used.add(tag)
+    return os.path.join(out_dir, f"TriggerSystemAPI.{tag}.verse")
+
+
+def run_batch(digest_dir, out_dir=".", pattern=DIGEST_PATTERN, jobs=None, deterministic=False, batched=False):
+    paths = sorted(glob.glob(os.path.join(digest_dir, pattern)))
+    if not paths:
+        print(f"No digests matching {pattern} in {os.path.abspath(digest_dir)}")
+        return []
+
+    blacklist = load_blacklist()
+    if blacklist:
+        print(f"Loaded {len(blacklist)} blacklisted device(s).")
+
+    os.makedirs(out_dir, exist_ok=True)
+    kinds = merged_kinds(batched)
+    used = set()
+    results = []
+
+    # Parse all digests concurrently; render and write in this process as they arrive
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for path, build_id, classes, parse_time in pool.map(parse_digest, paths):
+            t0 = time.perf_counter()
+            # The class model interns every name, so builds share one copy of each
+            model = model_from_classes(classes, build_id)
+            target = output_path(out_dir, build_id, path, used)
+            parts = iter_model_parts(model, blacklist, deterministic=deterministic, kinds=kinds)
+            merged = iter_merged(*parts, kinds=kinds, build_id=build_id, deterministic=deterministic)
+            written, _ = stream_to_file(target, merged)
+            results.append((build_id, target, len(model["devices"]), parse_time, time.perf_counter() - t0, written))
+
+    return results
+
+
+def print_report(results):
+    print(f"{'build':<45} {'devices':>7} {'parse (s)':>10} {'render (s)':>11}  file")
+    for build_id, target, devices, parse_time, render_time, written in results:
+        state = "" if written else " (unchanged)"
+        print(f"{build_id:<45} {devices:>7} {parse_time:>10.3f} {render_time:>11.3f}  {target}{state}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate trigger system APIs for a directory of digests.")
+    parser.add_argument("digest_dir", help="directory holding one digest per Fortnite build")
+    parser.add_argument("--out-dir", default=".", help="where to write TriggerSystemAPI.<build>.verse files")
+    parser.add_argument("--pattern", default=DIGEST_PATTERN, help=f"digest file glob (default {DIGEST_PATTERN})")
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="worker processes for parsing (default: CPU count)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-stable output: sorted devices, timestamp only from SOURCE_DATE_EPOCH")
+    parser.add_argument("--batched", action="store_true",
+                        help="also emit array-target output triggers and fan-in input listeners")
+    args = parser.parse_args(argv)
+    check_environment()
+
+    t0 = time.perf_counter()
+    results = run_batch(args.digest_dir, args.out_dir, args.pattern, args.jobs, args.deterministic, args.batched)
+    if results:
+        print_report(results)
+        print(f"Generated {len(results)} build(s) in {time.perf_counter() - t0:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
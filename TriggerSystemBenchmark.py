@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import TriggerSystemInput_Gen
+import TriggerSystemOutput_Gen
+from TriggerSystemParser import (
+    ClassHierarchy,
+    build_model,
+    collect_devices,
+    extract_build_id,
+    extract_classes,
+    extract_classes_parallel,
+    find_module_ranges,
+    load_api,
+    scan_digest,
+    snake_to_pascal,
+)
+
+SCALES = (1, 10, 100)
+
+
+def scale_digest(input_text, factor):
+    """
+    Build a synthetic digest by repeating the module sections of the real one
+    """
+    start = input_text.find("# Module import path:")
+    header, modules = input_text[:start], input_text[start:]
+    return header + "\n".join([modules] * factor)
+
+
+def digest_shape(input_text):
+    """
+    Class count, member lines per class, module count, inheritance depth and
+    the pool of member lines of a real digest
+    """
+    data = input_text.encode("utf-8")
+    classes = extract_classes(data)
+    member_lines = [
+        data[record[1]:record[2]].decode("utf-8").strip()
+        for record in scan_digest(data) if record[0] == "member"
+    ]
+
+    def depth(name):
+        seen = set()
+        while name in classes and name not in seen:
+            seen.add(name)
+            name = classes[name]["parent"]
+        return len(seen)
+
+    return {
+        "classes": len(classes),
+        "members": max(1, round(len(member_lines) / max(len(classes), 1))),
+        "modules": len(find_module_ranges(data)),
+        "depth": max((depth(name) for name in classes), default=1),
+        "member_lines": member_lines,
+    }
+
+
+def synthetic_digest(classes, depth, members, modules, member_lines, seed=0):
+    """
+    Digest with `classes` classes spread over `modules` modules.
+
+    Classes form parent chains `depth` long under creative_device_base; only
+    the last class of a chain is named *_device, so the rest are classified by
+    walking the hierarchy. Member lines are drawn from `member_lines`.
+    """
+    rng = random.Random(seed)
+    out = [
+        "# Synthetic digest for benchmarking",
+        f"# Generated from build: ++Synthetic+c{classes}-d{depth}-m{members}-k{modules}-s{seed}",
+        "",
+        "# Module import path: /Synthetic.com/Base",
+        "(/Synthetic.com:)Base<public> := module:",
+        "    creative_device_base<native><public> := class<abstract><epic_internal>(creative_object):",
+        "",
+    ]
+
+    per_module = max(1, -(-classes // max(modules, 1)))
+    emitted = 0
+    for m in range(modules):
+        out.append(f"# Module import path: /Synthetic.com/Module{m}")
+        out.append(f"(/Synthetic.com:)Module{m}<public> := module:")
+        out.append("    using {/Verse.org/Simulation}")
+        parent = "creative_device_base"
+        for j in range(per_module):
+            if emitted == classes:
+                break
+            link = j % depth
+            if link == 0:
+                parent = "creative_device_base"
+            suffix = "device" if link == depth - 1 or j == per_module - 1 else "base"
+            name = f"synth{m}_{j}_{suffix}"
+            out.append(f"    {name}<public> := class<concrete>({parent}):")
+            for line in rng.choices(member_lines, k=members):
+                out.append(f"        {line}")
+            out.append("")
+            parent = name
+            emitted += 1
+
+    return "\n".join(out) + "\n"
+
+
+def parse_all(digest):
+    # Class bodies are decoded lazily; touch them so the full parse is timed
+    classes = extract_classes(digest)
+    for entry in classes.values():
+        entry["methods"]
+    return classes
+
+
+def time_call(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_stages(digest, repeat=3):
+    """
+    Time and trace each generation stage separately; returns {stage: {"seconds", "peak_kib"}}
+    """
+    data = digest.encode("utf-8")
+    state = {}
+
+    def stage_parse():
+        state["classes"] = parse_all(data)
+
+    def stage_build_id():
+        state["build_id"] = extract_build_id(data)
+
+    def stage_devices():
+        device_set = set(collect_devices(state["classes"]))
+        state["device_classes"] = state["classes"].subset(n for n in state["classes"] if n in device_set)
+
+    def stage_hierarchy():
+        state["hierarchy"] = ClassHierarchy(state["device_classes"])
+
+    def stage_render():
+        for generator in (TriggerSystemInput_Gen, TriggerSystemOutput_Gen):
+            for _ in generator.iter_wrapper(state["device_classes"], set(), state["build_id"],
+                                            state["hierarchy"], deterministic=True):
+                pass
+
+    stages = (
+        ("extract_classes", stage_parse),
+        ("extract_build_id", stage_build_id),
+        ("collect_devices", stage_devices),
+        ("hierarchy", stage_hierarchy),
+        ("render", stage_render),
+    )
+
+    results = {}
+    for name, func in stages:
+        seconds = time_call(func, repeat=repeat)
+        # Separate traced run so tracing overhead does not skew the timing
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": seconds, "peak_kib": peak / 1024}
+
+    results["_counts"] = {"classes": len(state["classes"]), "devices": len(state["device_classes"])}
+    return results
+
+
+def plain_classes(classes):
+    """
+    The former {name: {"parent": str, "methods": list, "events": list}} layout,
+    with a private copy of every string as a separately parsed build had
+    """
+    def copy(s):
+        return s.encode("utf-8").decode("utf-8")
+
+    return {
+        copy(name): {
+            "parent": copy(entry["parent"]),
+            "methods": [copy(m) for m in entry["methods"]],
+            "events": [copy(e) for e in entry["events"]],
+        }
+        for name, entry in classes.items()
+    }
+
+
+def walk_plain(classes):
+    total = 0
+    for name in classes:
+        seen = set()
+        while name in classes and name not in seen:
+            seen.add(name)
+            name = classes[name]["parent"]
+        total += len(seen)
+    return total
+
+
+def walk_model(model):
+    parents = model.parents
+    total = 0
+    for i in range(len(model)):
+        depth = 0
+        # Parent ids never exceed the class count; a cycle stops after len(model) steps
+        while i >= 0 and depth <= len(parents):
+            depth += 1
+            i = parents[i]
+        total += depth
+    return total
+
+
+def retained_kib(build):
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / 1024
+
+
+def run_model(api_text, builds, repeat=3):
+    """
+    Memory held by `builds` parsed builds and parent-walk time, plain dicts vs ClassModel
+    """
+    data = api_text.encode("utf-8")
+
+    def parse_model():
+        # Fresh bytes per build, as if each came from its own digest
+        return parse_all(bytes(data))
+
+    retained_plain = retained_kib(lambda: [plain_classes(parse_model()) for _ in range(builds)])
+    retained_model = retained_kib(lambda: [parse_model() for _ in range(builds)])
+
+    model = parse_model()
+    plain = plain_classes(model)
+    walk_plain_s = time_call(walk_plain, plain, repeat=repeat)
+    walk_model_s = time_call(walk_model, model, repeat=repeat)
+
+    print(f"{len(model)} classes x {builds} build(s)")
+    print(f"{'':<20} {'plain dicts':>12} {'ClassModel':>12} {'ratio':>7}")
+    for label, old, new, unit in (
+        ("retained (KiB)", retained_plain, retained_model, 1),
+        ("parent walk (ms)", walk_plain_s, walk_model_s, 1000),
+    ):
+        print(f"{label:<20} {old * unit:>12.2f} {new * unit:>12.2f} {old / new:>6.2f}x")
+
+
+def legacy_render_input(name, hierarchy):
+    # Input section as rendered before the template layer, for comparison
+    events_unique = hierarchy.events(name)
+    if not events_unique:
+        return None
+
+    pascal = snake_to_pascal(name)
+    enum_name = f"{pascal}_InputOptions"
+    listener_name = f"{pascal}_Listener"
+    default = events_unique[0]
+
+    enum_entries = []
+    for i, ev in enumerate(events_unique):
+        if i == len(events_unique) - 1:
+            enum_entries.append(f"    {ev}")
+        else:
+            enum_entries.append(f"    {ev},")
+    enum_lines = "\n".join(enum_entries)
+
+    case_entries = []
+    for i, ev in enumerate(events_unique):
+        case_entries.append(f"            {enum_name}.{ev} => Target.{ev}.Subscribe(Wrapper.InputFunc)")
+    case_lines = "\n".join(case_entries)
+
+    return f"""# {name}
+
+{enum_name} := enum:
+{enum_lines}
+
+{listener_name} := class(trigger_input_system):
+
+    @editable
+    Target : {name} = {name}{{}}
+
+    @editable
+    Interaction : {enum_name} = {enum_name}.{default}
+
+    Subscribe<override>(OutputFunc : tuple() -> void):void =
+        Wrapper := input_api_wrapper() {{OutputFunc := OutputFunc}}
+        case(Interaction):
+{case_lines}
+
+"""
+
+
+def legacy_render_output(name, hierarchy):
+    # Output section as rendered before the template layer, for comparison
+    methods_unique = hierarchy.methods(name)
+    if not methods_unique:
+        return None
+
+    pascal = snake_to_pascal(name)
+    enum_name = f"{pascal}_Options"
+    class_name = pascal
+    default = methods_unique[0]
+
+    enum_entries = []
+    for i, method in enumerate(methods_unique):
+        if i == len(methods_unique) - 1:
+            enum_entries.append(f"    {method}")
+        else:
+            enum_entries.append(f"    {method},")
+    enum_lines = "\n".join(enum_entries)
+
+    case_entries = []
+    for i, method in enumerate(methods_unique):
+        if i == len(methods_unique) - 1:
+            case_entries.append(f"            {enum_name}.{method} => Target.{method}()")
+        else:
+            case_entries.append(f"            {enum_name}.{method} => Target.{method}(),")
+    case_lines = "\n".join(case_entries)
+
+    return f"""# {name}
+
+{enum_name} := enum:
+{enum_lines}
+
+{class_name} := class(trigger_output_system):
+
+    @editable
+    Target : {name} = {name}{{}}
+
+    @editable
+    Interaction : {enum_name} = {enum_name}.{default}
+
+    Trigger<override>():void=
+        case(Interaction):
+{case_lines}
+
+"""
+
+
+def run_render(digest, rounds, repeat=3):
+    """
+    Sections per second of the compiled templates vs the former f-string code
+    """
+    model = build_model(digest)
+    names = list(model["device_classes"]) * rounds
+    hierarchy = model["hierarchy"]
+
+    def render_all(render_input, render_output):
+        for name in names:
+            render_input(name, hierarchy)
+            render_output(name, hierarchy)
+
+    # Same bytes either way, or the comparison is meaningless
+    for name in model["device_classes"]:
+        assert legacy_render_input(name, hierarchy) == TriggerSystemInput_Gen.render_device(name, hierarchy)
+        assert legacy_render_output(name, hierarchy) == TriggerSystemOutput_Gen.render_device(name, hierarchy)
+
+    legacy = time_call(render_all, legacy_render_input, legacy_render_output, repeat=repeat)
+    compiled = time_call(render_all, TriggerSystemInput_Gen.render_device, TriggerSystemOutput_Gen.render_device,
+                         repeat=repeat)
+
+    sections = len(names) * 2
+    print(f"{len(model['device_classes'])} devices x {rounds} round(s), input + output")
+    print(f"{'renderer':<12} {'time (ms)':>10} {'sections/s':>12}")
+    print(f"{'f-string':<12} {legacy * 1000:>10.2f} {sections / legacy:>12.0f}")
+    print(f"{'templates':<12} {compiled * 1000:>10.2f} {sections / compiled:>12.0f} ({legacy / compiled:.2f}x)")
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_stages(results, baseline=None):
+    header = f"{'stage':<18} {'time (ms)':>10} {'peak (KiB)':>11}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    for name, stats in results.items():
+        if name.startswith("_"):
+            continue
+        row = f"{name:<18} {stats['seconds'] * 1000:>10.2f} {stats['peak_kib']:>11.1f}"
+        base = (baseline or {}).get(name)
+        if base and base["seconds"]:
+            row += f" {stats['seconds'] / base['seconds']:>7.2f}x"
+        print(row)
+    counts = results["_counts"]
+    print(f"{counts['classes']} classes, {counts['devices']} devices")
+
+
+def run_scale(api_text, jobs):
+    base = None
+    header = f"{'scale':>6} {'lines':>10} {'parse (s)':>10} {'us/line':>8} {'vs 1x':>7}"
+    if jobs > 1:
+        header += f" {f'jobs={jobs} (s)':>12} {'speedup':>8}"
+    print(header)
+    for factor in SCALES:
+        digest = scale_digest(api_text, factor).encode("utf-8")
+        lines = digest.count(b"\n") + 1
+        repeat = 3 if factor < 100 else 1
+        elapsed = time_call(parse_all, digest, repeat=repeat)
+        if base is None:
+            base = elapsed
+        row = f"{factor:>5}x {lines:>10} {elapsed:>10.3f} {elapsed / lines * 1e6:>8.2f} {elapsed / base:>6.1f}x"
+        if jobs > 1:
+            parallel = time_call(extract_classes_parallel, digest, jobs, repeat=repeat)
+            row += f" {parallel:>12.3f} {elapsed / parallel:>7.2f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark digest parsing and API generation.")
+    sub = parser.add_subparsers(dest="command")
+
+    scale = sub.add_parser("scale", help="parse time of the real digest repeated 1x/10x/100x (default)")
+    scale.add_argument("--jobs", type=int, default=0, metavar="N",
+                       help="also time extract_classes_parallel with N worker processes")
+
+    model = sub.add_parser("model", help="memory and lookup time of the class model vs plain dicts")
+    model.add_argument("--builds", type=int, default=4, help="parsed builds kept in memory at once")
+    model.add_argument("--repeat", type=int, default=3)
+
+    render = sub.add_parser("render", help="section rendering throughput, templates vs the former f-string code")
+    render.add_argument("--rounds", type=int, default=20, help="render every device this many times")
+    render.add_argument("--repeat", type=int, default=5)
+
+    stages = sub.add_parser("stages", help="per-stage time and peak memory on a synthetic or the real digest")
+    stages.add_argument("--real", action="store_true", help="use Fortnite.digest.verse instead of a synthetic digest")
+    stages.add_argument("--classes", type=int, help="class count (default: as in the real digest)")
+    stages.add_argument("--depth", type=int, help="inheritance chain length (default: as in the real digest)")
+    stages.add_argument("--members", type=int, help="member lines per class (default: as in the real digest)")
+    stages.add_argument("--modules", type=int, help="module count (default: as in the real digest)")
+    stages.add_argument("--seed", type=int, default=0)
+    stages.add_argument("--repeat", type=int, default=3)
+    stages.add_argument("--output", help="save results as JSON")
+    stages.add_argument("--compare", help="JSON results of an earlier run to compare against")
+
+    args = parser.parse_args()
+
+    api_text = load_api()
+    if not api_text:
+        raise SystemExit("No digest found to benchmark against.")
+
+    if args.command == "model":
+        run_model(api_text, args.builds, args.repeat)
+        raise SystemExit(0)
+
+    if args.command == "render":
+        run_render(api_text, args.rounds, args.repeat)
+        raise SystemExit(0)
+
+    if args.command != "stages":
+        run_scale(api_text, getattr(args, "jobs", 0))
+        raise SystemExit(0)
+
+    if args.real:
+        params = {"real": True}
+        digest = api_text
+    else:
+        shape = digest_shape(api_text)
+        params = {key: getattr(args, key) or shape[key] for key in ("classes", "depth", "members", "modules")}
+        params["seed"] = args.seed
+        digest = synthetic_digest(member_lines=shape["member_lines"], **params)
+
+    results = run_stages(digest, repeat=args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+
+    print(f"params: {params}")
+    print_stages(results, baseline)
+
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "params": params,
+            "digest_bytes": len(digest.encode("utf-8")),
+            "stages": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to: {os.path.abspath(args.output)}")
@@ -0,0 +1,166 @@
+"""On-disk regeneration cache keyed on the digest, blacklist and generator version."""
+import hashlib
+import json
+import os
+
+import TriggerSystemInput_Gen
+import TriggerSystemMerge
+import TriggerSystemOutput_Gen
+import TriggerSystemParser
+import TriggerSystemShard
+import TriggerSystemTemplates
+
+CACHE_DIR = ".trigger_cache"
+CACHE_FORMAT = 3
+CACHE_MAX_ENTRIES = 8
+
+# Any change to these files may change the parsed model, the rendered sections or the merged and shard layout
+GENERATOR_SOURCES = (
+    TriggerSystemParser.__file__,
+    TriggerSystemInput_Gen.__file__,
+    TriggerSystemOutput_Gen.__file__,
+    TriggerSystemTemplates.__file__,
+    TriggerSystemMerge.__file__,
+    TriggerSystemShard.__file__,
+)
+
+_generator_version = None
+
+
+def generator_version() -> str:
+    global _generator_version
+
+    if _generator_version is None:
+        h = hashlib.sha256(f"cache-format-{CACHE_FORMAT}".encode("utf-8"))
+        for path in GENERATOR_SOURCES:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _generator_version = h.hexdigest()
+
+    return _generator_version
+
+
+def digest_key(input_text) -> str:
+    h = hashlib.sha256(generator_version().encode("utf-8"))
+    h.update(TriggerSystemParser.as_bytes(input_text))
+    return h.hexdigest()
+
+
+def output_key(blacklist, options=()) -> str:
+    """
+    Key for one rendering of an entry: the blacklist plus any output options
+    """
+    h = hashlib.sha256("\n".join(sorted(blacklist)).encode("utf-8"))
+    for option in options:
+        h.update(f"\0{option}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def file_hash(path, block_size=1 << 16) -> str:
+    """
+    SHA-256 of a text file's UTF-8 content, read block by block
+    """
+    h = hashlib.sha256()
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            h.update(block.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_path(key, build_id, cache_dir):
+    return os.path.join(cache_dir, f"{TriggerSystemParser.build_tag(build_id)}.{key}.json")
+
+
+def _find_entry(key, cache_dir):
+    if not os.path.isdir(cache_dir):
+        return None
+
+    suffix = f".{key}.json"
+    for fname in os.listdir(cache_dir):
+        if fname.endswith(suffix):
+            return os.path.join(cache_dir, fname)
+
+    return None
+
+
+def load_entry(key, cache_dir=CACHE_DIR):
+    """
+    Return the cached entry for a digest key, or None on a miss
+    """
+    path = _find_entry(key, cache_dir)
+    if path is None:
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get("key") != key:
+        return None
+
+    # Mark as recently used for eviction
+    os.utime(path)
+    return entry
+
+
+def new_entry(key, model, sections):
+    return {
+        "key": key,
+        "build_id": model["build_id"],
+        # Plain dicts; this decodes every lazily parsed class body
+        "classes": {name: dict(entry) for name, entry in model["classes"].items()},
+        # {"<kind name>:<fingerprint>": {device: section}}; kinds are added as they are first rendered
+        "sections": sections,
+        # output_key -> content hash of the merged file written for it
+        "outputs": {},
+    }
+
+
+def is_current(entry, blacklist, merged_file, options=()) -> bool:
+    """
+    True if merged_file still holds what this entry rendered for the blacklist
+    """
+    expected = entry["outputs"].get(output_key(blacklist, options))
+    if not expected or not os.path.exists(merged_file):
+        return False
+
+    return file_hash(merged_file) == expected
+
+
+def record_output(entry, blacklist, output_hash, options=()):
+    entry["outputs"][output_key(blacklist, options)] = output_hash
+
+
+def store_entry(entry, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+    os.makedirs(cache_dir, exist_ok=True)
+
+    path = _entry_path(entry["key"], entry["build_id"], cache_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+    prune_cache(path, cache_dir, max_entries)
+
+
+def prune_cache(keep, cache_dir=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+    """
+    Drop other entries for the same build, then the least recently used ones
+    """
+    keep_build = os.path.basename(keep).rsplit(".", 2)[0]
+    entries = []
+
+    for fname in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, fname)
+        if not fname.endswith(".json") or path == keep:
+            continue
+        if fname.rsplit(".", 2)[0] == keep_build:
+            os.remove(path)
+            continue
+        entries.append((os.path.getmtime(path), path))
+
+    entries.sort(reverse=True)
+    for _, path in entries[max(max_entries - 1, 0):]:
+        os.remove(path)
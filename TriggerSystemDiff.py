@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Structural diff between two digests and delta-only patching of the merged API."""
+import argparse
+import os
+import re
+
+import TriggerSystemSnapshot
+import TriggerSystemTemplates
+from GenerateCompleteAPI import MERGED_FILE, check_environment, stream_to_file
+from TriggerSystemMerge import iter_merged, merged_kinds
+from TriggerSystemParser import MEMBER_KINDS, load_blacklist, open_api, pascal_name
+from TriggerSystemSnapshot import SnapshotRecord
+
+# Start of one device section inside a generated part, e.g.
+#   # button_device
+#
+#   ButtonDevice_Options := enum:
+# Batched sections open with their class instead of an enum. Names shared
+# by several modules are qualified, e.g. # (/Fortnite.com/Devices:)button_device
+SECTION_PATTERN = re.compile(
+    r'^# (?P<name>(?:\([^)\n]*:\))?[A-Za-z0-9_]+)\n\n[A-Za-z0-9_]+ := (?:enum:$|class\()', re.M
+)
+
+
+def _same_record(old, new):
+    """
+    Cheap equality of two snapshot records; False means "compare the members"
+    """
+    if not (isinstance(old, SnapshotRecord) and isinstance(new, SnapshotRecord)):
+        return False
+    return old.parent == new.parent and old.same_members(new)
+
+
+def diff_classes(old_classes, new_classes, first=()):
+    """
+    Compare the classes' own parent and members between two builds.
+
+    Takes the class models as they are, records and all; members are only
+    looked up record by record. Classes in first (e.g. the devices) are
+    compared and listed before the others.
+
+    Returns (added, removed, changed) where changed maps a class name to
+    {"parent": (old, new) or None, "methods": (added, removed), ...,
+    "kinds": {kind, ...}} with one (added, removed) pair per MEMBER_KINDS
+    kind; "kinds" also holds kinds whose members were only reordered.
+    """
+    added = [name for name in new_classes if name not in old_classes]
+    removed = [name for name in old_classes if name not in new_classes]
+    changed = {}
+
+    first = [name for name in first if name in new_classes]
+    seen = set(first)
+    for name in first + [name for name in new_classes if name not in seen]:
+        old = old_classes.get(name)
+        if old is None:
+            continue
+        new = new_classes[name]
+        if _same_record(old, new):
+            continue
+
+        delta = None
+        if old["parent"] != new["parent"]:
+            delta = {"parent": (old["parent"], new["parent"])}
+        for kind in MEMBER_KINDS:
+            old_members, new_members = old[kind], new[kind]
+            if old_members == new_members:
+                continue
+            if delta is None:
+                delta = {"parent": None}
+            delta.setdefault("kinds", set()).add(kind)
+            delta[kind] = (
+                [m for m in new_members if m not in old_members],
+                [m for m in old_members if m not in new_members],
+            )
+
+        if delta is not None:
+            delta.setdefault("kinds", set())
+            for kind in MEMBER_KINDS:
+                delta.setdefault(kind, ([], []))
+            changed[name] = delta
+
+    return added, removed, changed
+
+
+def affected_devices(old_model, new_model, kind):
+    """
+    Devices whose flattened members of this kind differ between the builds.
+
+    Comparing flattened lists carries a change on a parent such as
+    trigger_base_device to every descendant.
+    """
+    old_h, new_h = old_model["hierarchy"], new_model["hierarchy"]
+
+    affected = set(old_model["device_set"] ^ new_model["device_set"])
+    for name in new_model["device_set"] & old_model["device_set"]:
+        if old_h.members(kind, name) != new_h.members(kind, name):
+            affected.add(name)
+
+    return affected
+
+
+def changed_devices(new_model, added, removed, changed, kind):
+    """
+    Devices whose flattened members of this kind may differ, given diff_classes output.
+
+    A device is affected when a class on its parent chain, itself included,
+    was added, removed, got another parent or changed its own members of
+    this kind; so a change on a parent such as trigger_base_device carries
+    to every descendant without flattening the old build.
+    """
+    dirty = set(added)
+    dirty.update(removed)
+    dirty.update(name for name, delta in changed.items() if delta["parent"] or kind in delta["kinds"])
+
+    classes = new_model["classes"]
+    known = {}
+    affected = set()
+    for name in new_model["device_classes"]:
+        chain = []
+        cn = name
+        result = False
+        while cn:
+            if cn in known:
+                result = known[cn]
+                break
+            if cn in dirty:
+                result = True
+                break
+            if cn in chain:
+                break
+            chain.append(cn)
+            record = classes.get(cn)
+            cn = record.parent if record is not None else None
+        for cn in chain:
+            known[cn] = result
+        if result:
+            affected.add(name)
+
+    return affected
+
+
+def change_origin(name, classes, changed, added=(), removed=()):
+    """
+    (class, "changed" | "added" | "removed") for the nearest class on the
+    parent chain, itself included, that was changed, added or removed, or
+    None. The chain runs through the new build; a removed ancestor shows up
+    as a parent reference it no longer declares.
+    """
+    seen = set()
+    cn = name
+    while cn and cn not in seen:
+        if cn in changed:
+            return cn, "changed"
+        if cn in added:
+            return cn, "added"
+        if cn in removed:
+            return cn, "removed"
+        if cn not in classes:
+            break
+        seen.add(cn)
+        cn = classes[cn]["parent"]
+    return None
+
+
+def split_sections(part):
+    """
+    Split one generated part into its header and {device name: section text}
+    """
+    matches = list(SECTION_PATTERN.finditer(part))
+    if not matches:
+        return part, {}
+
+    sections = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(part)
+        # Same shape as render_device output, wherever the section ends up
+        sections[m.group('name')] = part[m.start():end].rstrip() + "\n\n"
+
+    return part[:matches[0].start()], sections
+
+
+def iter_patched(kind, model, blacklist, existing, affected, deterministic, stats):
+    """
+    Yield the parts of one wrapper kind's output, reusing unaffected existing sections
+    """
+    # Header only: no classes to render; iter_merged writes the build banner
+    yield from TriggerSystemTemplates.iter_wrapper(kind, {}, blacklist, deterministic=deterministic)
+
+    classes = model["device_classes"]
+    for name in (sorted(classes) if deterministic else classes):
+        if name in blacklist:
+            continue
+        if name in existing and name not in affected:
+            stats["reused"] += 1
+            yield existing[name]
+            continue
+        wrapper = kind.render_device(name, model["hierarchy"])
+        if wrapper:
+            stats["rendered"].append(name)
+            yield wrapper
+
+
+def read_parts(path):
+    """
+    The merged file split into one part per merged kind; missing parts are empty.
+
+    Returns (kinds, parts); a file written with --batched keeps its batched parts.
+    """
+    rest = ""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            rest = f.read()
+
+    # Batched parts are only present when some batched kind's separator is
+    plain = {kind.name for kind, _ in merged_kinds()}
+    batched = any(separator in rest for kind, separator in merged_kinds(True) if kind.name not in plain)
+    kinds = merged_kinds(batched)
+    parts = [""] * len(kinds)
+    if not rest:
+        return kinds, parts
+
+    for i, (_, separator) in enumerate(kinds[1:], 1):
+        parts[i - 1], found, rest = rest.partition(separator)
+        if not found:
+            return kinds, parts
+    parts[-1] = rest
+    return kinds, parts
+
+
+def format_changelog(old_build_id, new_model, added, removed, changed, rendered):
+    lines = [f"# Digest diff: {old_build_id} -> {new_model['build_id']}", ""]
+
+    lines.append(f"## Added classes ({len(added)})")
+    lines.extend(f"- {name}" for name in added)
+    lines.append("")
+    lines.append(f"## Removed classes ({len(removed)})")
+    lines.extend(f"- {name}" for name in removed)
+    lines.append("")
+    lines.append(f"## Changed classes ({len(changed)})")
+    for name, delta in changed.items():
+        lines.append(f"- {name}")
+        if delta["parent"]:
+            lines.append(f"    parent: {delta['parent'][0]} -> {delta['parent'][1]}")
+        for kind in MEMBER_KINDS:
+            member_added, member_removed = delta[kind]
+            lines.extend(f"    + {kind[:-1]} {m}" for m in member_added)
+            lines.extend(f"    - {kind[:-1]} {m}" for m in member_removed)
+    lines.append("")
+
+    lines.append("## Re-rendered sections")
+    classes = new_model["classes"]
+    added, removed = set(added), set(removed)
+    for kind, names in rendered:
+        for name in names:
+            origin = change_origin(name, classes, changed, added, removed)
+            if origin is None or origin == (name, "added"):
+                reason = "new section"
+            elif origin[0] == name:
+                reason = "own change"
+            elif origin[1] == "changed":
+                reason = f"inherited via {origin[0]}"
+            else:
+                reason = f"inherited via {origin[1]} {origin[0]}"
+            lines.append(f"- {pascal_name(name)} [{kind.name}] ({reason})")
+
+    return "\n".join(lines) + "\n"
+
+
+def open_digest(path):
+    data = open_api(path)
+    if not data:
+        raise SystemExit(f"No digest found at {os.path.abspath(path)}")
+    return data
+
+
+def patch_api(old_digest, new_digest, api_file=MERGED_FILE, deterministic=False, write=True):
+    """
+    Re-render only the device sections of api_file that differ between two digests.
+
+    Returns the changelog text.
+    """
+    # Snapshots skip parsing; the old build only needs its classes, not devices or a hierarchy
+    old_classes, old_build_id, _ = TriggerSystemSnapshot.load_classes(open_digest(old_digest), old_digest)
+    new_model, _ = TriggerSystemSnapshot.load_model(open_digest(new_digest), new_digest)
+    blacklist = load_blacklist()
+
+    added, removed, changed = diff_classes(old_classes, new_model["classes"],
+                                           first=new_model["device_classes"].names)
+
+    rendered = []
+    streams = []
+    kinds, parts = read_parts(api_file)
+    for (kind, _), part in zip(kinds, parts):
+        _, existing = split_sections(part)
+        affected = changed_devices(new_model, added, removed, changed, kind.members)
+        stats = {"reused": 0, "rendered": []}
+        rendered.append((kind, stats["rendered"]))
+        streams.append(iter_patched(kind, new_model, blacklist, existing, affected, deterministic, stats))
+
+    merged = iter_merged(*streams, kinds=kinds, build_id=new_model["build_id"], deterministic=deterministic)
+    if write:
+        stream_to_file(api_file, merged)
+    else:
+        # Still walk the streams so the changelog lists what would be re-rendered
+        for _ in merged:
+            pass
+
+    return format_changelog(old_build_id, new_model, added, removed, changed, rendered)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two digests and patch only the affected API sections.")
+    parser.add_argument("old_digest", help="digest the existing API file was generated from")
+    parser.add_argument("new_digest", help="digest to update the API file to")
+    parser.add_argument("--api", default=MERGED_FILE, help=f"merged API file to patch (default {MERGED_FILE})")
+    parser.add_argument("--changelog", help="write the changelog here instead of printing it")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without touching the API file")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-stable output: sorted devices, timestamp only from SOURCE_DATE_EPOCH")
+    args = parser.parse_args(argv)
+    check_environment()
+
+    changelog = patch_api(args.old_digest, args.new_digest, args.api, args.deterministic, write=not args.dry_run)
+
+    if args.changelog:
+        with open(args.changelog, "w", encoding="utf-8") as f:
+            f.write(changelog)
+        print(f"Changelog written to: {os.path.abspath(args.changelog)}")
+    else:
+        print(changelog, end="")
+
+
+if __name__ == "__main__":
+    main()
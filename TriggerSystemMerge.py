@@ -0,0 +1,87 @@
+"""Merged-file layout: part order, separators and how the part streams are joined."""
+import hashlib
+
+import TriggerSystemInput_Gen  # noqa: F401  registers the input wrapper kinds
+import TriggerSystemOutput_Gen  # noqa: F401  registers the output wrapper kinds
+import TriggerSystemShard
+import TriggerSystemTemplates
+
+def merged_kinds(batched=False):
+    """
+    (kind, separator) of every registered wrapper kind in merged-file order
+    """
+    return TriggerSystemTemplates.layout_kinds(batched)
+
+
+def layout_key(kinds):
+    """
+    Hash of the merged layout: which kinds, in which order, after which separators, with which templates
+    """
+    h = hashlib.sha256()
+    for kind, separator in kinds:
+        h.update(f"{kind.name}\0{kind.fingerprint}\0{separator}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def iter_stripped(parts, sep="\n"):
+    """
+    Yield sep.join(parts).strip() piece by piece, holding back one part at most
+    """
+    pending = ""
+    for part in parts:
+        if not pending:
+            pending = part.lstrip()
+        elif not part.strip():
+            # Whitespace-only parts may still be trailing; keep them pending
+            pending += sep + part
+        else:
+            yield pending
+            pending = sep + part
+    pending = pending.rstrip()
+    if pending:
+        yield pending
+
+
+def iter_merged(*kind_parts, kinds=None, build_id=None, deterministic=False):
+    """
+    Merge the part streams of kinds, in that order, into one file; the first part has no separator.
+
+    With a build id the file opens with one build banner above all parts.
+    """
+    if kinds is None:
+        kinds = merged_kinds()
+    if build_id:
+        # A blank line parts the banner from the first header
+        yield TriggerSystemTemplates.fancy_header(build_id, deterministic) + "\n"
+    for i, ((_, separator), parts) in enumerate(zip(kinds, kind_parts)):
+        if i:
+            yield separator
+        yield from iter_stripped(parts)
+
+
+def iter_model_parts(model, blacklist, sections=None, deterministic=False, kinds=None, report_skipped=True):
+    """
+    One part stream per kinds entry; sections is a matching list of {device: section}
+    """
+    if kinds is None:
+        kinds = merged_kinds()
+    for i, (kind, _) in enumerate(kinds):
+        kind_sections = sections[i] if sections is not None else None
+        # Blacklisted devices are reported once, not once per kind
+        yield TriggerSystemTemplates.iter_generate(kind, model, blacklist, kind_sections, deterministic,
+                                                   report_skipped=report_skipped and i == 0)
+
+
+def iter_shard_output(model, blacklist, by, sections=None, deterministic=False, kinds=None, report_skipped=True):
+    """
+    (file name, devices, text) of the base file, then of every shard
+    """
+    if kinds is None:
+        kinds = merged_kinds()
+    # The base file is the merged file without devices: every part header with its base classes.
+    # Its timestamp only comes from SOURCE_DATE_EPOCH, so it does not change on every run.
+    base_model = dict(model, device_classes=model["device_classes"].subset(()))
+    base = iter_merged(*iter_model_parts(base_model, blacklist, deterministic=True, kinds=kinds), kinds=kinds,
+                       build_id=model["build_id"], deterministic=True)
+    yield TriggerSystemShard.BASE_FILE, [], "".join(base)
+    yield from TriggerSystemShard.iter_shards(model, blacklist, by, kinds, sections, deterministic, report_skipped)
@@ -1,242 +1,157 @@
 #!/usr/bin/env python3
-import re
 import os
 
-BLACKLIST_FILE = "blacklist.txt"
-API_FILE = "Fortnite.digest.verse"
+import TriggerSystemTemplates
+from TriggerSystemParser import build_model, load_blacklist, open_api
+from TriggerSystemTemplates import WrapperKind
 
 
-def snake_to_pascal(s: str) -> str:
-    return ''.join(part.capitalize() for part in s.split('_'))
-
-def load_api():
-    if not os.path.exists(API_FILE):
-        return ""
-
-    with open(API_FILE, "r", encoding="utf-8") as f:
-        return f.read()
-
-def load_blacklist():
-    if not os.path.exists(BLACKLIST_FILE):
-        return set()
-
-    with open(BLACKLIST_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+WRAPPER = TriggerSystemTemplates.register(WrapperKind(
+    "output",
+    members="methods",
+    header="""using { /Fortnite.com/Devices }
+using { /Fortnite.com/Devices/Patchwork }
+using { /Verse.org/Simulation }
 
-    blacklist = set()
+# API Base call
 
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        blacklist.add(line)
+trigger_output_system<public> := class():
 
-    return blacklist
+    Trigger():void=
+        {}
+""",
+    fields={
+        "enum_name": "{pascal}_Options",
+        "class_name": "{pascal}",
+    },
+    lists={
+        "enum_lines": ("    {member}", ",\n"),
+        "case_lines": ("            {enum_name}.{member} => Target.{member}()", ",\n"),
+    },
+    section="""# {name}
 
+{enum_name} := enum:
+{enum_lines}
 
-def extract_classes(input_text):
-    # Match lines like:
-    #   text_button_base<native><public> := class<abstract>(widget):
-    #   (/Module/Path:)item_name<public> := class<final>(entity):
-    class_pattern = re.compile(
-        r'(?m)^\s*(?P<qualname>(?:\([^\)]*\))?[A-Za-z0-9_/:\-]+?)<[^>]*>\s*:=\s*class[^()]*\((?P<parent>[^)]+)\):(?P<body>.*?)(?=^\s*(?:[^\n]+<[^>]*>\s*:=\s*class)|\Z)',
-        re.S | re.M
-    )
+{class_name} := class(trigger_output_system):
 
-    def simple_name(qualname: str) -> str:
-        # If a module prefix in parentheses exists like '(/path:)name', extract after '):'
-        if '):' in qualname:
-            return qualname.split('):', 1)[1]
-        # Otherwise, if a colon appears, take text after last ':'
-        if ':' in qualname:
-            return qualname.split(':')[-1]
-        return qualname
+    @editable
+    Target : {name} = {name}{{}}
 
-    classes = {}
+    @editable
+    Interaction : {enum_name} = {enum_name}.{default}
 
-    for m in class_pattern.finditer(input_text):
-        qual = m.group('qualname').strip()
-        name = simple_name(qual)
-        parent_qual = m.group('parent').strip()
-        # parent may be qualified too; take last token after ':' or '/'
-        if '):' in parent_qual:
-            parent = parent_qual.split('):', 1)[1]
-        elif ':' in parent_qual:
-            parent = parent_qual.split(':')[-1]
-        else:
-            parent = parent_qual
-
-        body = m.group('body')
-
-        # Find method-like signatures inside the class body.
-        # Captures lines like: Name<...>(Param1:Type):Return = external {}
-        method_pattern = re.compile(
-            r'^\s*([A-Za-z_][A-Za-z0-9_]*)'                     # method name
-            r'(?:<[^>]*>)?\s*'                                   # optional generics/qualifiers
-            r'\((?P<params>[^)]*)\)\s*'                        # parameters
-            r'(?:\:(?P<rettype>[^=\n]+))?',
-            re.M
-        )
-
-        methods = []
-        for mo in method_pattern.finditer(body):
-            mname = mo.group(1)
-            params = mo.group('params') or ''
-            rettype = (mo.group('rettype') or '').strip()
-
-            # Keep only parameterless methods
-            if params.strip() != '':
-                continue
-
-            # Skip events/listenable or subscribable patterns by checking nearby text
-            line_pattern = re.compile(r'^\s*' + re.escape(mname) + r'[^\n]*$', re.M)
-            line_match = line_pattern.search(body)
-            sig_line = line_match.group(0) if line_match else ''
-            sig_lower = sig_line.lower()
-            if 'listenable' in sig_lower or 'event' in sig_lower or 'listenable(' in sig_lower:
-                continue
-
-            # Require return type to be 'void' (allow optional whitespace and qualifiers)
-            # Some signatures may include generics or attributes after the return type; check start
-            if not rettype.lower().startswith('void'):
-                continue
-
-            methods.append(mname)
-
-        classes[name] = {
-            "parent": parent.strip(),
-            "methods": methods
-        }
-
-    return classes
-
-
-def extract_build_id(input_text: str) -> str:
-    """Extract the build id from the API header, if present."""
-    if not input_text:
-        return "unknown"
-    m = re.search(r'^[ \t]*#\s*Generated from build:\s*(.+)$', input_text, re.M)
-    if m:
-        return m.group(1).strip()
-    # alternative pattern
-    m2 = re.search(r'Generated from build[:\s]+([^\n\r]+)', input_text)
-    if m2:
-        return m2.group(1).strip()
-    return "unknown"
-
-
-def resolve_methods(class_name, classes, visited=None):
-    """
-    Rekursiv alle Methoden von Parent + eigener Klasse sammeln
-    """
-    if visited is None:
-        visited = set()
+    Trigger<override>():void=
+        case(Interaction):
+{case_lines}
 
-    if class_name in visited:
-        return []
+""",
+), order=20, separator="\n\n# === OUTPUT API ===\n\n")
 
-    visited.add(class_name)
+# Methods acting on one agent, e.g. Activate(Agent:agent):void
+AGENT_WRAPPER = TriggerSystemTemplates.register(WrapperKind(
+    "output_agent",
+    members="agent_methods",
+    header="""using { /Fortnite.com/Devices }
+using { /Fortnite.com/Devices/Patchwork }
+using { /Verse.org/Simulation }
 
-    current = classes.get(class_name)
-    if not current:
-        return []
+# Agent API Base call
 
-    all_methods = []
+trigger_output_agent_system<public> := class():
 
-    parent = current["parent"]
+    Trigger(Agent:agent):void=
+        {}
+""",
+    fields={
+        "enum_name": "{pascal}_AgentOptions",
+        "class_name": "{pascal}_Agent",
+    },
+    lists={
+        "enum_lines": ("    {member}", ",\n"),
+        "case_lines": ("            {enum_name}.{member} => Target.{member}(Agent)", ",\n"),
+    },
+    section="""# {name}
 
-    if parent in classes:
-        parent_methods = resolve_methods(parent, classes, visited)
-        all_methods.extend(parent_methods)
+{enum_name} := enum:
+{enum_lines}
 
-    all_methods.extend(current["methods"])
+{class_name} := class(trigger_output_agent_system):
 
-    seen = set()
-    unique = []
-    for m in all_methods:
-        if m not in seen:
-            seen.add(m)
-            unique.append(m)
+    @editable
+    Target : {name} = {name}{{}}
 
-    return unique
+    @editable
+    Interaction : {enum_name} = {enum_name}.{default}
 
+    Trigger<override>(Agent:agent):void=
+        case(Interaction):
+{case_lines}
 
-def generate_wrapper(classes, blacklist, build_id=None):
-    out_parts = []
+""",
+), order=40, separator="\n\n# === AGENT OUTPUT API ===\n\n")
 
-    header = """using { /Fortnite.com/Devices }
+# <suspends> methods, e.g. OnBegin()<suspends>:void; their trigger has to be awaited,
+# so the base call suspends and the helpers below run several triggers concurrently
+ASYNC_WRAPPER = TriggerSystemTemplates.register(WrapperKind(
+    "output_async",
+    members="async_methods",
+    header="""using { /Fortnite.com/Devices }
 using { /Fortnite.com/Devices/Patchwork }
 using { /Verse.org/Simulation }
 
-# API Base call
+# Suspending API Base call
 
-trigger_output_system<public> := class():
+trigger_output_async_system<public> := class():
 
-    Trigger():void=
+    TriggerAsync()<suspends>:void=
         {}
-"""
-    out_parts.append(header)
-
-    # If a build id was provided, include a fancy header
-    if build_id:
-        fancy = f"""# ==================================
-#  Generated from API build: {build_id}
-#  Generated on: {__import__('datetime').datetime.utcnow().isoformat()}Z
-# ==================================
-"""
-        out_parts.insert(0, fancy)
-
-    for name, data in classes.items():
-
-        if name in blacklist:
-            print(f"Skipping blacklisted device: {name}")
-            continue
-
-        methods = resolve_methods(name, classes)
-
-        if not methods:
-            continue
-
-        seen = set()
-        methods_unique = []
-        for mm in methods:
-            if mm not in seen:
-                seen.add(mm)
-                methods_unique.append(mm)
-
-        pascal = snake_to_pascal(name)
-        enum_name = f"{pascal}_Options"
-        class_name = pascal
-        default = methods_unique[0]
-
-        # Enum
-        enum_entries = []
-        for i, method in enumerate(methods_unique):
-            if i == len(methods_unique) - 1:
-                enum_entries.append(f"    {method}")
-            else:
-                enum_entries.append(f"    {method},")
-        enum_lines = "\n".join(enum_entries)
-
-        # Case
-        case_entries = []
-        for i, method in enumerate(methods_unique):
-            if i == len(methods_unique) - 1:
-                case_entries.append(
-                    f"            {enum_name}.{method} => Target.{method}()"
-                )
-            else:
-                case_entries.append(
-                    f"            {enum_name}.{method} => Target.{method}(),"
-                )
-        case_lines = "\n".join(case_entries)
-
-        wrapper = f"""# {name}
+
+# Runs an immediate trigger where a suspending one is expected
+trigger_output_immediate<public> := class(trigger_output_async_system):
+
+    @editable
+    Source : trigger_output_system = trigger_output_system{}
+
+    TriggerAsync<override>()<suspends>:void=
+        Source.Trigger()
+
+# Starts every trigger without waiting for any of them
+SpawnTriggers<public>(Triggers:[]trigger_output_async_system):void=
+    for (Entry : Triggers):
+        spawn{Entry.TriggerAsync()}
+
+# Runs every trigger concurrently and returns once all of them finished
+SyncTriggers<public>(Triggers:[]trigger_output_async_system)<suspends>:void=
+    if (First := Triggers[0], Rest := Triggers.Slice[1]):
+        sync:
+            First.TriggerAsync()
+            SyncTriggers(Rest)
+
+# Runs every trigger concurrently and returns once the first one finished, cancelling the others
+RaceTriggers<public>(Triggers:[]trigger_output_async_system)<suspends>:void=
+    if (First := Triggers[0], Rest := Triggers.Slice[1]):
+        if (Rest.Length > 0):
+            race:
+                First.TriggerAsync()
+                RaceTriggers(Rest)
+        else:
+            First.TriggerAsync()
+""",
+    fields={
+        "enum_name": "{pascal}_AsyncOptions",
+        "class_name": "{pascal}_Async",
+    },
+    lists={
+        "enum_lines": ("    {member}", ",\n"),
+        "case_lines": ("            {enum_name}.{member} => Target.{member}()", ",\n"),
+    },
+    section="""# {name}
 
 {enum_name} := enum:
 {enum_lines}
 
-{class_name} := class(trigger_output_system):
+{class_name} := class(trigger_output_async_system):
 
     @editable
     Target : {name} = {name}{{}}
@@ -244,74 +159,92 @@ trigger_output_system<public> := class():
     @editable
     Interaction : {enum_name} = {enum_name}.{default}
 
+    TriggerAsync<override>()<suspends>:void=
+        case(Interaction):
+{case_lines}
+
+""",
+), order=50, separator="\n\n# === ASYNC OUTPUT API ===\n\n")
+
+# Opt-in array-target variant of WRAPPER: one instance dispatches once and
+# calls the method on every target. Reuses the enum of the output part.
+BATCHED_WRAPPER = TriggerSystemTemplates.register(WrapperKind(
+    "output_batched",
+    members="methods",
+    header="""# Batched API: one trigger drives every device in Targets
+""",
+    fields={
+        "enum_name": "{pascal}_Options",
+        "class_name": "{pascal}_Batch",
+    },
+    lists={
+        "case_lines": ("            {enum_name}.{member} => for (Target : Targets) {{ Target.{member}() }}", ",\n"),
+    },
+    section="""# {name}
+
+{class_name} := class(trigger_output_system):
+
+    @editable
+    Targets : []{name} = array{{}}
+
+    @editable
+    Interaction : {enum_name} = {enum_name}.{default}
+
     Trigger<override>():void=
         case(Interaction):
 {case_lines}
 
-"""
-        out_parts.append(wrapper)
+""",
+), order=70, separator="\n\n# === BATCHED OUTPUT API ===\n\n", batched=True)
 
-    return "\n".join(out_parts).strip()
 
+# render_device(name, hierarchy): the section for one device, or None if it has no methods
+render_device = WRAPPER.render_device
 
-def is_device(class_name: str, classes: dict) -> bool:
-    # Consider as device if it (directly or indirectly) inherits from a creative_device.* base
-    # or if the name contains 'device'
-    visited = set()
 
-    def walk(cn: str):
-        if cn in visited:
-            return False
-        visited.add(cn)
-        if 'creative_device' in cn:
-            return True
-        entry = classes.get(cn)
-        if not entry:
-            return False
-        parent = entry.get('parent')
-        if not parent:
-            return False
-        # parent may include qualifiers; take simple part
-        parent_simple = parent.split('.')[-1].split(':')[-1]
-        if 'creative_device' in parent_simple:
-            return True
-        return walk(parent_simple)
+def iter_wrapper(classes, blacklist, build_id=None, hierarchy=None, sections=None, deterministic=False):
+    """
+    Yield the parts of the wrapper file one at a time, to be joined by newlines
+    """
+    return TriggerSystemTemplates.iter_wrapper(WRAPPER, classes, blacklist, build_id, hierarchy, sections,
+                                               deterministic)
 
-    # also treat classes whose name contains 'device' as devices
-    if 'device' in class_name.lower():
-        return True
 
-    return walk(class_name)
+def generate_wrapper(classes, blacklist, build_id=None, hierarchy=None, sections=None, deterministic=False):
+    parts = iter_wrapper(classes, blacklist, build_id, hierarchy, sections, deterministic)
+    return "\n".join(parts).strip()
 
 
-def collect_devices(classes: dict):
-    devices = []
-    for name in classes.keys():
-        if is_device(name, classes):
-            devices.append(name)
-    return sorted(devices)
+def render_sections(classes, hierarchy):
+    """
+    Render every device section up front, keyed by class name
+    """
+    return TriggerSystemTemplates.render_sections(WRAPPER, classes, hierarchy)
+
+
+def iter_generate(model, blacklist, sections=None, deterministic=False):
+    # A file of its own, so it carries the build banner
+    return TriggerSystemTemplates.iter_generate(WRAPPER, model, blacklist, sections, deterministic,
+                                                build_id=model["build_id"])
+
+
+def generate(model, blacklist, sections=None, deterministic=False):
+    return "\n".join(iter_generate(model, blacklist, sections, deterministic)).strip()
 
 
 if __name__ == "__main__":
 
-    input_file = load_api()
+    input_file = open_api()
 
     blacklist = load_blacklist()
     if blacklist:
         print(f"Loaded {len(blacklist)} blacklisted device(s).")
 
-    classes = extract_classes(input_file)
-
-    # Extract build id from the API text
-    build_id = extract_build_id(input_file)
-
-    # Collect devices (no devices.txt written)
-    devices = collect_devices(classes)
-    print(f"Found {len(devices)} device(s).")
+    model = build_model(input_file)
+    print(f"Found {len(model['devices'])} device(s).")
 
     # Generate wrappers only for devices
-    device_classes = {k: v for k, v in classes.items() if k in devices}
-    result = generate_wrapper(device_classes, blacklist, build_id=build_id)
+    result = generate(model, blacklist)
 
     output_file = "OutputTriggerAPI.verse"
     with open(output_file, "w", encoding="utf-8") as f:
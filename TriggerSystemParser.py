@@ -0,0 +1,1204 @@
+"""Shared digest parsing for the input and output trigger generators."""
+import mmap
+import re
+import os
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from TriggerSystemProfile import stage
+
+BLACKLIST_FILE = "blacklist.txt"
+API_FILE = "Fortnite.digest.verse"
+
+
+def snake_to_pascal(s: str) -> str:
+    return ''.join(part.capitalize() for part in s.split('_'))
+
+def source_date_epoch():
+    """
+    The SOURCE_DATE_EPOCH timestamp as an aware UTC datetime, or None when unset.
+
+    Raises ValueError naming the variable when it is not a usable Unix timestamp.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return None
+    try:
+        return datetime.fromtimestamp(int(epoch), timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(f"SOURCE_DATE_EPOCH must be a Unix timestamp in whole seconds, got {epoch!r}") from None
+
+def generation_timestamp(deterministic=False):
+    """
+    Timestamp for generated headers.
+
+    SOURCE_DATE_EPOCH wins when set; otherwise deterministic mode returns
+    None so the line can be left out.
+    """
+    moment = source_date_epoch()
+    if moment is not None:
+        return moment.replace(tzinfo=None).isoformat() + "Z"
+    if deterministic:
+        return None
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+def load_api():
+    if not os.path.exists(API_FILE):
+        return ""
+
+    with open(API_FILE, "r", encoding="utf-8") as f:
+        return f.read()
+
+def open_api(path=API_FILE):
+    """
+    Memory-map the digest read-only; the parser works on byte offsets into it
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return b""
+
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def read_api(path=API_FILE):
+    """
+    Read the digest into memory. For models that outlive the call: records
+    keep their source until loaded, and on Windows a live mapping stops the
+    digest from being replaced.
+    """
+    if not os.path.exists(path):
+        return b""
+
+    with open(path, "rb") as f:
+        return f.read()
+
+def build_tag(build_id):
+    """
+    File-name safe form of a build id, e.g. for per-build output or cache files
+    """
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', build_id or "").strip('_') or "unknown"
+
+def as_bytes(data):
+    # Parser entry points take the digest as text or as a bytes-like buffer
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+def load_blacklist():
+    if not os.path.exists(BLACKLIST_FILE):
+        return set()
+
+    with open(BLACKLIST_FILE, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    blacklist = set()
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        blacklist.add(line)
+
+    return blacklist
+
+
+# Matches definition lines like:
+#   text_button_base<native><public> := class<abstract><epic_internal>(widget):
+#   (/Fortnite.com:)UI<public> := module:
+#   entitlement_change<native><public>(t:type) := class<internal>:
+#   turret<public> := class((/Fortnite.com/Devices:)creative_device_base, healthful, damageable):
+# `parents` keeps the whole parenthesised list; parse_parents splits it
+DEFINITION_PATTERN = re.compile(
+    r'^(?P<qualname>(?:\([^)]*\))?[A-Za-z0-9_]+)(?:<[^>]*>)*(?:\([^)]*\))?'
+    r'\s*:=\s*(?P<kind>class|module|interface|struct|enum)(?:<[^>]*>)*'
+    r'\s*(?P<parents>\(.*\))?\s*:\s*$'
+)
+
+# Imports, e.g. using {/Fortnite.com/Devices}
+USING_PATTERN = re.compile(rb'using\s*\{\s*([^}\s]+)\s*\}')
+
+# The first qualified top-level module names the digest's root, e.g. (/Fortnite.com:)UI
+DIGEST_ROOT_PATTERN = re.compile(rb'^\(([^)\n]*):\)[A-Za-z0-9_]+(?:<[^>\n]*>)*[ \t]*:=[ \t]*module\b', re.M)
+
+
+def split_qualname(qualname: str, module: str = ""):
+    """
+    (module path, name) of a definition name; '(/Fortnite.com/UI:)text_button_base'
+    carries its own path, a bare name belongs to the given module
+    """
+    if qualname.startswith('(') and ':)' in qualname:
+        path, name = qualname[1:].split(':)', 1)
+        return path, name
+    return module, qualname
+
+
+def simple_name(qualname: str) -> str:
+    # Drop a module qualifier in parentheses like '(/path:)name'
+    if qualname.startswith('(') and ':)' in qualname:
+        return qualname.split(':)', 1)[1]
+    # Otherwise, if a colon appears, take text after last ':'
+    if ':' in qualname:
+        return qualname.split(':')[-1]
+    return qualname
+
+
+def verse_name(module: str, name: str) -> str:
+    """
+    Verse-qualified reference to a definition, e.g. (/Fortnite.com/Devices:)button_device
+    """
+    return f"({module}:){name}"
+
+
+def pascal_name(name: str) -> str:
+    """
+    PascalCase identifier for a model key; a qualified key keeps its module
+    path in front so classes sharing a simple name get distinct identifiers
+    """
+    if not name.startswith('('):
+        return snake_to_pascal(name)
+    module, simple = split_qualname(name)
+    return '_'.join(s for s in (pascal_module(module), snake_to_pascal(simple)) if s)
+
+
+def pascal_module(module: str) -> str:
+    """
+    PascalCase identifier for a module path, e.g. FortniteCom_Devices for /Fortnite.com/Devices
+    """
+    segments = [''.join(w[:1].upper() + w[1:] for w in re.split(r'[^A-Za-z0-9]+', s)) for s in module.split('/')]
+    return '_'.join(s for s in segments if s)
+
+
+def digest_root(data) -> str:
+    """
+    Path of the digest's unqualified top-level modules, e.g. /Fortnite.com; "" if unknown
+    """
+    m = DIGEST_ROOT_PATTERN.search(as_bytes(data))
+    return m.group(1).decode("utf-8") if m else ""
+
+
+def scan_digest(data, root=None):
+    """
+    Single indentation-aware pass over the digest bytes.
+
+    Yields ("module", path), ("using", module, imported),
+    ("class", qualname, parents, module) and ("member", start, end) records;
+    parents is the tuple of superclass and interface references as written.
+    Module paths are absolute (/Fortnite.com/Devices); member spans are
+    byte offsets of lines that belong to the last class record.
+    """
+    data = as_bytes(data)
+    if root is None:
+        root = digest_root(data)
+    # (indent, kind, module path) of the definitions enclosing the current line
+    scopes = []
+    pos = 0
+    size = len(data)
+
+    while pos < size:
+        start = pos
+        end = data.find(b"\n", pos)
+        if end < 0:
+            end = size
+        pos = end + 1
+
+        line = data[start:end]
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith(b'#'):
+            continue
+
+        indent = len(line) - len(stripped)
+        while scopes and scopes[-1][0] >= indent:
+            scopes.pop()
+
+        m = DEFINITION_PATTERN.match(stripped.decode("utf-8")) if b':=' in stripped else None
+        if m:
+            kind = m.group('kind')
+            module = scopes[-1][2] if scopes else root
+            if kind == 'module':
+                parent_path, name = split_qualname(m.group('qualname'), module)
+                module = f"{parent_path}/{name}"
+                yield ("module", module)
+            elif kind == 'class':
+                yield ("class", m.group('qualname'), parse_parents(m.group('parents')), module)
+            scopes.append((indent, kind, module))
+            continue
+
+        if scopes and scopes[-1][1] == 'class':
+            yield ("member", start, end)
+        elif stripped.startswith(b'using'):
+            m = USING_PATTERN.match(stripped)
+            if m:
+                yield ("using", scopes[-1][2] if scopes else root, m.group(1).decode("utf-8"))
+
+
+# Member lists kept per class. methods/events are the zero-arg ones; the
+# agent_* kinds take (or send) exactly one agent; async_methods are the
+# zero-arg <suspends> methods, which only a suspending caller can await,
+# minus engine hooks (see HOOK_SPECIFIERS).
+MEMBER_KINDS = ("methods", "events", "agent_methods", "agent_events", "async_methods")
+
+# Effects an immediate Trigger():void can call through. <decides> needs a
+# failure context and <suspends> an async one.
+IMMEDIATE_EFFECTS = frozenset(("transacts", "reads", "writes", "allocates", "computes", "converges", "no_rollback"))
+
+# Specifiers of hooks the engine calls into, such as creative_device's
+# OnBegin<native_callable>; calling one would re-run the device's script
+HOOK_SPECIFIERS = frozenset(("native_callable", "override"))
+
+_OPENERS = "([{"
+BRACKET_PATTERN = re.compile(r'[()\[\]{}]')
+TOP_COMMA_PATTERN = re.compile(r'[()\[\]{},]')
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z0-9_]*')
+SPECIFIER_PATTERN = re.compile(r'\s*<([^>]*)>')
+
+
+def _match_close(text, i):
+    """
+    Index just past the bracket opened at text[i], honouring nesting
+    """
+    depth = 0
+    for m in BRACKET_PATTERN.finditer(text, i):
+        if m.group() in _OPENERS:
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    # Unbalanced: the bracket runs to the end of the text
+    return len(text)
+
+
+def _find_top(text, token):
+    """
+    Index of token outside any brackets, or -1
+    """
+    depth = 0
+    scanned = 0
+    i = text.find(token)
+    while i >= 0:
+        # Only the brackets between the previous candidate and this one are new
+        for m in BRACKET_PATTERN.finditer(text, scanned, i):
+            depth += 1 if m.group() in _OPENERS else -1
+        if depth == 0:
+            return i
+        scanned = i
+        i = text.find(token, i + 1)
+    return -1
+
+
+def _split_top(text):
+    """
+    Split on commas outside any brackets
+    """
+    if not BRACKET_PATTERN.search(text):
+        parts = text.split(',')
+    else:
+        parts = []
+        depth = 0
+        start = 0
+        for m in TOP_COMMA_PATTERN.finditer(text):
+            ch = m.group()
+            if ch == ',':
+                if depth == 0:
+                    parts.append(text[start:m.start()])
+                    start = m.end()
+            elif ch in _OPENERS:
+                depth += 1
+            else:
+                depth -= 1
+        parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_parents(text):
+    """
+    References in a definition's parent list, e.g. ('(/x:)base', 'healthful') for '((/x:)base, healthful)'
+    """
+    if not text:
+        return ()
+    inner = text[1:-1]
+    # Almost every list is plain names; only qualified or generic references need the bracket scan
+    if '(' not in inner and ')' not in inner and '[' not in inner:
+        return tuple(part.strip() for part in inner.split(',') if part.strip())
+    return tuple(_split_top(text[1:_match_close(text, 0) - 1]))
+
+
+def _identifier_end(text, i=0):
+    return IDENTIFIER_PATTERN.match(text, i).end()
+
+
+def _read_specifiers(text, i):
+    """
+    Read <...> specifiers starting at text[i]; returns (specifiers, index after them)
+    """
+    specifiers = []
+    m = SPECIFIER_PATTERN.match(text, i)
+    while m:
+        specifiers.append(m.group(1).strip())
+        i = m.end()
+        m = SPECIFIER_PATTERN.match(text, i)
+    while i < len(text) and text[i] == ' ':
+        i += 1
+    return tuple(specifiers), i
+
+
+class TypeRef:
+    """
+    A parsed Verse type.
+
+    kind is "named" (agent, (/path:)vector3), "option" (?t), "array" ([]t),
+    "map" ([k]v), "tuple" (tuple(a, b)), "generic" (listenable(t)),
+    "function" (a -> b) or "refined" (type {...}, kept as written); args
+    holds the nested types.
+    """
+
+    __slots__ = ("kind", "name", "args", "path")
+
+    def __init__(self, kind, name="", args=(), path=""):
+        self.kind = kind
+        self.name = name
+        self.args = args
+        self.path = path
+
+    def is_named(self, name):
+        return self.kind == "named" and self.name == name
+
+    def __eq__(self, other):
+        return isinstance(other, TypeRef) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __str__(self):
+        if self.kind == "named":
+            return f"({self.path}:){self.name}" if self.path else self.name
+        if self.kind == "option":
+            return f"?{self.args[0]}"
+        if self.kind == "array":
+            return f"[]{self.args[0]}"
+        if self.kind == "map":
+            return f"[{self.args[0]}]{self.args[1]}"
+        if self.kind in ("tuple", "generic"):
+            return f"{self.name}({', '.join(str(arg) for arg in self.args)})"
+        if self.kind == "function":
+            return f"{self.args[0]} -> {self.args[1]}"
+        return self.name
+
+    def __repr__(self):
+        return f"TypeRef({str(self)!r})"
+
+
+# Type text -> TypeRef, parameter list text -> Params and member line ->
+# MemberSignature; digests repeat the same few signatures
+# (Enable<public>():void) across hundreds of classes
+_TYPE_CACHE = {}
+_PARAMS_CACHE = {}
+_SIGNATURE_CACHE = {}
+
+
+def parse_type(text):
+    text = text.strip()
+    type_ref = _TYPE_CACHE.get(text)
+    if type_ref is None:
+        type_ref = _TYPE_CACHE[text] = _parse_type(text)
+    return type_ref
+
+
+def _parse_type(text):
+    arrow = _find_top(text, "->")
+    if arrow >= 0:
+        return TypeRef("function", args=(parse_type(text[:arrow]), parse_type(text[arrow + 2:])))
+
+    if text.startswith('?'):
+        return TypeRef("option", args=(parse_type(text[1:]),))
+
+    if text.startswith('['):
+        end = _match_close(text, 0)
+        key = text[1:end - 1].strip()
+        value = parse_type(text[end:])
+        if not key:
+            return TypeRef("array", args=(value,))
+        return TypeRef("map", args=(parse_type(key), value))
+
+    if text.startswith('type') and text[4:].lstrip().startswith('{'):
+        return TypeRef("refined", text)
+
+    path = ""
+    if text.startswith('('):
+        end = _match_close(text, 0)
+        inner = text[1:end - 1]
+        if not inner.endswith(':'):
+            # Parenthesised type
+            return parse_type(inner)
+        # Module qualified, e.g. (/UnrealEngine.com/Temporary/SpatialMath:)vector3
+        path = inner[:-1]
+        text = text[end:].lstrip()
+
+    end = _identifier_end(text)
+    if end == 0:
+        return TypeRef("refined", text)
+
+    name = text[:end]
+    rest = text[end:].lstrip()
+    if rest.startswith('('):
+        close = _match_close(rest, 0)
+        args = tuple(parse_type(arg) for arg in _split_top(rest[1:close - 1]))
+        return TypeRef("tuple" if name == "tuple" else "generic", name, args, path)
+
+    return TypeRef("named", name, (), path)
+
+
+class Param:
+    __slots__ = ("name", "type", "named", "default")
+
+    def __init__(self, name, type_ref, named=False, default=False):
+        self.name = name
+        self.type = type_ref
+        # ?Name:type parameters are passed by name and may have a default
+        self.named = named
+        self.default = default
+
+    def __repr__(self):
+        return f"Param({'?' if self.named else ''}{self.name}:{self.type}{' = ...' if self.default else ''})"
+
+
+def _parse_params(text):
+    params = _PARAMS_CACHE.get(text)
+    if params is None:
+        params = _PARAMS_CACHE[text] = tuple(_parse_param(p) for p in _split_top(text))
+    return params
+
+
+def _parse_param(text):
+    named = text.startswith('?')
+    if named:
+        text = text[1:]
+    eq = _find_top(text, "=")
+    default = eq >= 0
+    if default:
+        text = text[:eq]
+    name, _, type_text = text.partition(':')
+    return Param(name.strip(), parse_type(type_text), named, default)
+
+
+class MemberSignature:
+    """
+    One class member line, parsed.
+
+    kind is "method" (has a parameter list), "event" (a listenable(...)
+    field) or "field". specifiers follow the name (<public>), effects follow
+    the parameters (<transacts>, <decides>, <suspends>).
+    """
+
+    __slots__ = ("kind", "name", "specifiers", "params", "effects", "type")
+
+    def __init__(self, kind, name, specifiers, params, effects, type_ref):
+        self.kind = kind
+        self.name = name
+        self.specifiers = specifiers
+        self.params = params
+        self.effects = effects
+        self.type = type_ref
+
+    @property
+    def suspends(self):
+        return "suspends" in self.effects
+
+    @property
+    def transacts(self):
+        return "transacts" in self.effects
+
+    @property
+    def decides(self):
+        return "decides" in self.effects
+
+    @property
+    def immediate(self):
+        """
+        True when an immediate caller can run it: no <suspends>, no <decides>
+        """
+        return all(e in IMMEDIATE_EFFECTS for e in self.effects)
+
+    def payload(self):
+        """
+        Type an event sends, e.g. agent for listenable(agent)
+        """
+        if self.kind == "event" and self.type.args:
+            return self.type.args[0]
+        return None
+
+    def __repr__(self):
+        params = "" if self.params is None else f"({', '.join(map(repr, self.params))})"
+        effects = "".join(f"<{e}>" for e in self.effects)
+        return f"MemberSignature({self.kind} {self.name}{params}{effects}:{self.type})"
+
+
+# The common shape, without nested brackets in the parameters or braces and
+# comparisons in the type; anything else takes the bracket-aware path
+SIMPLE_SIGNATURE_PATTERN = re.compile(
+    r'(?P<name>[A-Za-z_][A-Za-z0-9_]*)(?P<specifiers>(?:<[^<>]*>)*)'
+    r'(?:\((?P<params>[^()]*)\)(?P<effects>(?:<[^<>]*>)*))?'
+    r'(?::(?P<type>[^=:{}<>]+?))?(?: = .*)?'
+)
+
+
+def parse_signature(line):
+    """
+    Parse a member line such as `Enable<public>(Agent:agent)<transacts>:void = external {}`.
+
+    Returns a MemberSignature, or None if the line does not start with a name.
+    Results are cached per line text.
+    """
+    text = line.strip()
+    signature = _SIGNATURE_CACHE.get(text)
+    if signature is None and text not in _SIGNATURE_CACHE:
+        signature = _SIGNATURE_CACHE[text] = _parse_signature(text)
+    return signature
+
+
+def _split_specifiers(text):
+    return tuple(s.strip() for s in text[1:-1].split('><')) if text else ()
+
+
+def _parse_signature(text):
+    m = SIMPLE_SIGNATURE_PATTERN.fullmatch(text)
+    if m:
+        name = m.group('name')
+        specifiers = _split_specifiers(m.group('specifiers'))
+        params_text = m.group('params')
+        params = None if params_text is None else _parse_params(params_text)
+        effects = _split_specifiers(m.group('effects'))
+        type_text = m.group('type')
+        type_ref = None if type_text is None else parse_type(type_text)
+    else:
+        end = _identifier_end(text)
+        if end == 0 or text[0].isdigit():
+            return None
+
+        name = text[:end]
+        specifiers, i = _read_specifiers(text, end)
+
+        params = None
+        effects = ()
+        if i < len(text) and text[i] == '(':
+            close = _match_close(text, i)
+            params = _parse_params(text[i + 1:close - 1])
+            effects, i = _read_specifiers(text, close)
+
+        rest = text[i:].lstrip()
+        type_ref = None
+        if rest.startswith(':') and not rest.startswith(':='):
+            type_text = rest[1:]
+            # The value (= external {}) follows the type at the top level
+            eq = _find_top(type_text, " = ")
+            if eq >= 0:
+                type_text = type_text[:eq]
+            type_ref = parse_type(type_text)
+
+    if params is not None:
+        kind = "method"
+    elif type_ref is not None and type_ref.kind == "generic" and type_ref.name == "listenable":
+        kind = "event"
+    else:
+        kind = "field"
+
+    return MemberSignature(kind, name, specifiers, params, effects, type_ref)
+
+
+def classify_body(lines):
+    """
+    Collect a class body's wrappable members per MEMBER_KINDS
+    """
+    members = {kind: [] for kind in MEMBER_KINDS}
+    for line in lines:
+        sig = parse_signature(line)
+        if sig is None:
+            continue
+
+        if sig.kind == "method":
+            # Skip events/listenable or subscribable patterns
+            sig_lower = line.lower()
+            if 'listenable' in sig_lower or 'event' in sig_lower:
+                continue
+            if sig.type is None or not sig.type.is_named('void'):
+                continue
+            if sig.immediate:
+                if not sig.params:
+                    members["methods"].append(sig.name)
+                elif len(sig.params) == 1 and not sig.params[0].named and sig.params[0].type.is_named('agent'):
+                    members["agent_methods"].append(sig.name)
+            elif sig.suspends and not sig.decides and not sig.params and HOOK_SPECIFIERS.isdisjoint(sig.specifiers):
+                members["async_methods"].append(sig.name)
+
+        elif sig.kind == "event":
+            payload = sig.payload()
+            # Only allow exact listenable(tuple()) for zero-arg events
+            if payload is not None and payload.kind == "tuple" and not payload.args:
+                members["events"].append(sig.name)
+            elif payload is not None and payload.is_named('agent'):
+                members["agent_events"].append(sig.name)
+
+    return members
+
+
+def _body_lines(data, start, end):
+    body = as_bytes(data)[start:end].decode("utf-8")
+    # Comments and blank lines between members are part of the span
+    return [line for line in body.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+
+
+class ClassRecord(Mapping):
+    """
+    One class of the digest, read like {"parent", "path", "methods", ...}.
+
+    `path` is the class's qualified id (/Fortnite.com/Devices/button_device)
+    and `parent` the model key of its resolved parent. Only the (start, end)
+    byte span of the body is kept; members are decoded and classified the
+    first time they are looked up, into tuples of interned names.
+    """
+
+    __slots__ = ("parent", "path", "_data", "_start", "_end", "_members")
+
+    KEYS = ("parent", "path") + MEMBER_KINDS
+
+    def __init__(self, parent, path, data, start, end):
+        self.parent = parent
+        self.path = path
+        self._data = data
+        self._start = start
+        self._end = end
+        self._members = None
+
+    def _load(self):
+        if self._members is None:
+            members = classify_body(_body_lines(self._data, self._start, self._end))
+            self._members = {kind: tuple(map(sys.intern, names)) for kind, names in members.items()}
+            self._data = None
+        return self._members
+
+    @classmethod
+    def from_members(cls, parent, path, members):
+        """
+        Record for an already classified class, e.g. from the cache or a worker process
+        """
+        record = cls(sys.intern(parent), sys.intern(path), None, 0, 0)
+        record._members = {kind: tuple(map(sys.intern, members.get(kind, ()))) for kind in MEMBER_KINDS}
+        return record
+
+    def __getitem__(self, key):
+        if key == "parent":
+            return self.parent
+        if key == "path":
+            return self.path
+        if key in MEMBER_KINDS:
+            return self._load()[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"ClassRecord({dict(self)!r})"
+
+
+class ClassModel(Mapping):
+    """
+    The classes of one digest, addressed by integer id.
+
+    Names are the collision-free keys from SymbolTable, interned and stored
+    once in `names`; `paths` maps each class's qualified id back to its id.
+    `parents` holds each class's parent id, or -1 when the parent is not
+    part of the model. Reads like {name: record}, so callers can keep
+    treating it as a dict.
+    """
+
+    __slots__ = ("names", "ids", "paths", "records", "parents")
+
+    def __init__(self, names, records):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.paths = {record.path: i for i, record in enumerate(records)}
+        self.records = records
+        ids = self.ids
+        self.parents = array("i", [ids.get(record.parent, -1) for record in records])
+
+    @classmethod
+    def from_mapping(cls, classes):
+        """
+        Wrap {name: {"parent", "methods", "events", ...}}; a ClassModel is returned as is
+        """
+        if isinstance(classes, ClassModel):
+            return classes
+
+        names = []
+        records = []
+        for name, entry in classes.items():
+            if isinstance(entry, dict):
+                # Entries written before classes had paths are keyed by their simple name
+                entry = ClassRecord.from_members(entry["parent"], entry.get("path") or name, entry)
+            names.append(sys.intern(name))
+            records.append(entry)
+        return cls(names, records)
+
+    def subset(self, names):
+        """
+        Model of just these classes, sharing the records; ids are renumbered
+        """
+        ids = self.ids
+        names = list(names)
+        return ClassModel(names, [self.records[ids[name]] for name in names])
+
+    def lookup(self, name):
+        """
+        Id of a class by key, path or Verse-qualified name; -1 if it is not in the model
+        """
+        i = self.ids.get(name)
+        if i is not None:
+            return i
+        if name.startswith('('):
+            name = "/".join(split_qualname(name))
+        return self.paths.get(name, -1)
+
+    def __getitem__(self, name):
+        return self.records[self.ids[name]]
+
+    def get(self, name, default=None):
+        i = self.ids.get(name)
+        return default if i is None else self.records[i]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"ClassModel({len(self.names)} classes)"
+
+
+class SymbolTable:
+    """
+    Module-aware names of the classes declared in one digest.
+
+    Every class gets a path, its module path plus its name, and a model key:
+    the simple name, or the Verse-qualified name when several modules
+    declare the same simple name. Parents resolve the way Verse looks names
+    up: the class's own module, then the enclosing modules outwards, then
+    the `using` imports of all of those; a name still not found falls back
+    to the one class of that name in the digest, if it is unique.
+    """
+
+    def __init__(self):
+        # Per declared class, in declaration order
+        self.paths = []
+        self.names = []
+        self.modules = []
+        self.parent_refs = []
+        # path -> declaration; module path -> {simple name: declaration}
+        self._declared = {}
+        self._members = {}
+        # module path -> imported module paths, in order
+        self.usings = {}
+        self._scopes = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def declare(self, qualname, parents, module):
+        """
+        Add a class with its parent references and return its declaration
+        index; redeclaring a path replaces it in place
+        """
+        if qualname.startswith('('):
+            module, qualname = split_qualname(qualname, module)
+        path = f"{module}/{qualname}"
+        i = self._declared.get(path)
+        if i is None:
+            i = self._declared[path] = len(self.paths)
+            self.paths.append(sys.intern(path))
+            self.names.append(sys.intern(qualname))
+            self.modules.append(module)
+            self.parent_refs.append(parents)
+            self._members.setdefault(module, {})[qualname] = i
+        else:
+            self.parent_refs[i] = parents
+        return i
+
+    def use(self, module, imported):
+        self.usings.setdefault(module, []).append(imported)
+        self._scopes.clear()
+
+    def scope(self, module):
+        """
+        {simple name: declaration} visible from a module, built once per module
+        """
+        scope = self._scopes.get(module)
+        if scope is None:
+            parts = module.split("/")
+            chain = ["/".join(parts[:k]) for k in range(1, len(parts) + 1)]
+            # Later updates win: imports, then the enclosing modules from the outside in
+            scope = {}
+            for enclosing in chain:
+                for imported in self.usings.get(enclosing, ()):
+                    scope.update(self._members.get(imported, ()))
+            for enclosing in chain:
+                scope.update(self._members.get(enclosing, ()))
+            self._scopes[module] = scope
+        return scope
+
+    def resolve(self):
+        """
+        (keys, parents): the model key of every class and the key of its
+        superclass; a superclass outside the digest keeps its simple name
+        """
+        counts = Counter(self.names)
+        unique = {name: i for i, name in enumerate(self.names) if counts[name] == 1}
+
+        keys = [name if counts[name] == 1 else sys.intern(verse_name(module, name))
+                for name, module in zip(self.names, self.modules)]
+
+        parents = []
+        for references, module in zip(self.parent_refs, self.modules):
+            # The superclass is the first reference naming a class of the digest;
+            # the others are interfaces, which are not declared here
+            i = -1
+            for reference in references:
+                if reference.startswith('('):
+                    i = self._declared.get("/".join(split_qualname(reference)), -1)
+                else:
+                    scope = self._scopes.get(module)
+                    if scope is None:
+                        scope = self.scope(module)
+                    i = scope.get(reference)
+                    if i is None:
+                        i = unique.get(reference, -1)
+                if i >= 0:
+                    break
+            if i >= 0:
+                parents.append(keys[i])
+            else:
+                parents.append(sys.intern(simple_name(references[0])) if references else "")
+
+        return keys, parents
+
+
+def _scan_declarations(data, root):
+    """
+    scan_digest reduced to a list of ("class", qualname, parents, module,
+    start, end) records, body span included, and ("using", module,
+    imported) records; classes without members get a (0, 0) span
+    """
+    declarations = []
+    current = None
+
+    for record in scan_digest(data, root):
+        if record[0] == "member":
+            if current is not None:
+                if current[4] == 0:
+                    current[4] = record[1]
+                current[5] = record[2]
+        elif record[0] == "class":
+            current = ["class", record[1], record[2], record[3], 0, 0]
+            declarations.append(current)
+        else:
+            current = None
+            if record[0] == "using":
+                declarations.append(record)
+
+    return declarations
+
+
+def extract_classes(input_text):
+    data = as_bytes(input_text)
+    table = SymbolTable()
+    spans = {}
+
+    for record in _scan_declarations(data, digest_root(data)):
+        if record[0] == "using":
+            table.use(record[1], record[2])
+            continue
+        _, qualname, parents, module, start, end = record
+        spans[table.declare(qualname, parents, module)] = (start, end)
+
+    keys, parents = table.resolve()
+    records = [ClassRecord(parents[i], table.paths[i], data, *spans[i]) for i in range(len(table))]
+    return ClassModel(keys, records)
+
+
+# Top-level module definitions start at column 0, e.g. (/Fortnite.com:)UI<public> := module:
+MODULE_START_PATTERN = re.compile(rb'^(?:\([^)\n]*\))?[A-Za-z0-9_]+(?:<[^>\n]*>)*[ \t]*:=[ \t]*module\b', re.M)
+
+
+def find_module_ranges(data):
+    """
+    Quick pre-scan splitting the digest into independent top-level (start, end) ranges
+    """
+    data = as_bytes(data)
+    starts = [m.start() for m in MODULE_START_PATTERN.finditer(data)]
+    bounds = [0] + [s for s in starts if s > 0] + [len(data)]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+# Nested definitions, e.g.     button_device<public> := class<concrete><final>(creative_device):
+NESTED_DEFINITION_PATTERN = re.compile(
+    rb'^([ \t]+)(?:\([^)\n]*\))?[A-Za-z0-9_]+(?:<[^>\n]*>)*(?:\([^)\n]*\))?[ \t]*:=[ \t]*'
+    rb'(?:class|module|interface|struct|enum)\b', re.M)
+# Ranges are split into roughly this many pieces per worker, so one large module does not leave the others idle
+PIECES_PER_JOB = 4
+
+
+def split_module_range(data, start, end, root, size):
+    """
+    Split one top-level range into (start, end, root) pieces of about size bytes.
+
+    Pieces are cut only before the module's direct child definitions, so
+    every piece but the first starts at the module's own scope; those
+    pieces get the module's path as their root.
+    """
+    if end - start <= size:
+        return [(start, end, root)]
+    header_end = data.find(b"\n", start, end)
+    m = DEFINITION_PATTERN.match(data[start:header_end if header_end >= 0 else end].decode("utf-8"))
+    if not m or m.group('kind') != 'module':
+        return [(start, end, root)]
+    parent_path, name = split_qualname(m.group('qualname'), root)
+    module = f"{parent_path}/{name}"
+
+    children = [(len(c.group(1)), c.start()) for c in NESTED_DEFINITION_PATTERN.finditer(data, header_end + 1, end)]
+    if not children:
+        return [(start, end, root)]
+    # Only the shallowest definitions are direct children of the module
+    child_indent = min(indent for indent, _ in children)
+
+    pieces = []
+    piece_start, piece_root = start, root
+    for indent, cut in children:
+        if indent == child_indent and cut - piece_start >= size:
+            pieces.append((piece_start, cut, piece_root))
+            piece_start, piece_root = cut, module
+    pieces.append((piece_start, end, piece_root))
+    return pieces
+
+
+def find_work_ranges(data, jobs):
+    """
+    find_module_ranges with large modules split at their child definitions,
+    as (start, end, root) pieces that parse independently
+    """
+    data = as_bytes(data)
+    root = digest_root(data)
+    size = max(1, len(data) // (jobs * PIECES_PER_JOB))
+    pieces = []
+    for start, end in find_module_ranges(data):
+        pieces.extend(split_module_range(data, start, end, root, size))
+    return pieces
+
+
+def _extract_module_range(args):
+    # Runs in a worker process; lazy records cannot cross the process boundary,
+    # and names are resolved by the parent once every range is known
+    chunk, root = args
+    declarations = []
+    for record in _scan_declarations(chunk, root):
+        if record[0] == "class":
+            _, qualname, parents, module, start, end = record
+            members = classify_body(_body_lines(chunk, start, end))
+            record = ("class", qualname, parents, module, members)
+        declarations.append(record)
+    return declarations
+
+
+def extract_classes_parallel(input_text, jobs):
+    """
+    extract_classes over pieces of the top-level modules in a process pool.
+
+    Pieces are merged in digest order, so the result matches the serial parse.
+    """
+    data = as_bytes(input_text)
+    chunks = [(bytes(data[start:end]), root) for start, end, root in find_work_ranges(data, jobs)]
+
+    table = SymbolTable()
+    members = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for part in pool.map(_extract_module_range, chunks):
+            for record in part:
+                if record[0] == "using":
+                    table.use(record[1], record[2])
+                else:
+                    _, qualname, parents, module, classified = record
+                    members[table.declare(qualname, parents, module)] = classified
+
+    keys, parents = table.resolve()
+    records = [ClassRecord.from_members(parents[i], table.paths[i], members[i]) for i in range(len(table))]
+    return ClassModel(keys, records)
+
+
+BUILD_ID_PATTERN = re.compile(rb'^[ \t]*#\s*Generated from build:\s*(.+)$', re.M)
+BUILD_ID_FALLBACK_PATTERN = re.compile(rb'Generated from build[:\s]+([^\n\r]+)')
+
+
+def extract_build_id(input_text: str) -> str:
+    """Extract the build id from the API header, if present."""
+    if not input_text:
+        return "unknown"
+    data = as_bytes(input_text)
+    m = BUILD_ID_PATTERN.search(data)
+    if m:
+        return m.group(1).strip().decode("utf-8")
+    # alternative pattern
+    m2 = BUILD_ID_FALLBACK_PATTERN.search(data)
+    if m2:
+        return m2.group(1).strip().decode("utf-8")
+    return "unknown"
+
+
+class ClassHierarchy:
+    """
+    Inheritance index over an extract_classes() model.
+
+    Classes are ordered parents-first once by id; each class then stores its
+    flattened, ordered, de-duplicated members of every MEMBER_KINDS kind as
+    tuples. A class that adds nothing new shares its parent's tuple instead
+    of copying it.
+    """
+
+    def __init__(self, classes):
+        self.classes = model = ClassModel.from_mapping(classes)
+        order = self._topological_order(model)
+        self.order = [model.names[i] for i in order]
+        self._members = {kind: [()] * len(model) for kind in MEMBER_KINDS}
+
+        parents = model.parents
+        for kind, flattened in self._members.items():
+            for i in order:
+                # Parents come first in the order; a parent that is unknown or part of a cycle contributes nothing
+                parent = parents[i]
+                flattened[i] = self._flatten(flattened[parent] if parent >= 0 else (), model.records[i][kind])
+
+    @staticmethod
+    def _topological_order(model):
+        parents = model.parents
+        order = []
+        # 0: not reached, 1: on the current chain, 2: ordered
+        state = bytearray(len(model))
+
+        for i in range(len(model)):
+            chain = []
+            current = i
+            while current >= 0 and not state[current]:
+                state[current] = 1
+                chain.append(current)
+                current = parents[current]
+            for cid in reversed(chain):
+                state[cid] = 2
+                order.append(cid)
+
+        return order
+
+    @staticmethod
+    def _flatten(inherited, own):
+        if not own:
+            return inherited
+
+        seen = set(inherited)
+        added = []
+        for m in own:
+            if m not in seen:
+                seen.add(m)
+                added.append(m)
+
+        return inherited + tuple(added) if added else inherited
+
+    def methods(self, class_name):
+        """
+        All methods of the parent chain plus the class itself
+        """
+        return self.members("methods", class_name)
+
+    def events(self, class_name):
+        """
+        All events (listenable tuple() entries) of the parent chain plus the class itself
+        """
+        return self.members("events", class_name)
+
+    def members(self, kind, class_name):
+        """
+        All members of one MEMBER_KINDS kind along the parent chain plus the class itself
+        """
+        i = self.classes.ids.get(class_name)
+        return () if i is None else self._members[kind][i]
+
+
+def _creative_device_flags(model):
+    # A class is a creative device if its name, or that of any ancestor,
+    # contains creative_device. Resolved parents-first over class ids so
+    # every class reads its parent's answer instead of walking its chain
+    flags = bytearray(len(model))
+    names, parents = model.names, model.parents
+
+    for i in ClassHierarchy._topological_order(model):
+        parent = parents[i]
+        name = names[i]
+        # Qualified keys carry a module path such as /Fortnite.com/Devices; only the name counts
+        if 'creative_device' in (simple_name(name) if name.startswith('(') else name):
+            flags[i] = 1
+        elif parent >= 0:
+            flags[i] = flags[parent]
+        else:
+            parent_name = model.records[i].parent
+            flags[i] = bool(parent_name) and 'creative_device' in simple_name(parent_name)
+
+    return flags
+
+
+def collect_devices(classes: dict):
+    model = ClassModel.from_mapping(classes)
+    flags = _creative_device_flags(model)
+    return sorted(name for i, name in enumerate(model.names)
+                  if flags[i] or 'device' in (simple_name(name) if name.startswith('(') else name).lower())
+
+
+def build_model(input_text, jobs=1):
+    """
+    Parse the digest once and return the class model shared by both generators
+    """
+    data = as_bytes(input_text)
+    with stage("extract_classes"):
+        if jobs > 1:
+            classes = extract_classes_parallel(data, jobs)
+        else:
+            classes = extract_classes(data)
+    with stage("extract_build_id"):
+        build_id = extract_build_id(data)
+    return model_from_classes(classes, build_id)
+
+
+def model_from_classes(classes, build_id):
+    """
+    Derive devices and the hierarchy index from already extracted classes
+    """
+    classes = ClassModel.from_mapping(classes)
+    with stage("collect_devices"):
+        devices = collect_devices(classes)
+        device_set = set(devices)
+        device_classes = classes.subset(name for name in classes.names if name in device_set)
+
+    # Lazily parsed class bodies are decoded here, on first member lookup
+    with stage("hierarchy"):
+        hierarchy = ClassHierarchy(device_classes)
+
+    return {
+        "build_id": build_id,
+        "classes": classes,
+        "devices": devices,
+        "device_set": device_set,
+        "device_classes": device_classes,
+        "hierarchy": hierarchy,
+    }
@@ -0,0 +1,171 @@
+"""Opt-in per-stage timing, allocation and regex-call instrumentation."""
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_active = None
+
+
+class StageStats:
+    __slots__ = ("calls", "wall", "cpu", "net_blocks", "peak_kib", "regex")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        # Blocks still allocated on exit minus those on entry, not allocations made
+        self.net_blocks = 0
+        self.peak_kib = 0.0
+        # pattern name -> calls
+        self.regex = {}
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "wall_ms": self.wall * 1000,
+            "cpu_ms": self.cpu * 1000,
+            "net_blocks": self.net_blocks,
+            "peak_kib": self.peak_kib,
+            "regex_calls": dict(self.regex),
+        }
+
+
+class Profiler:
+    """
+    Accumulates wall time, CPU time, net allocated blocks and regex calls per stage.
+
+    Stages may be entered many times (rendering and writing alternate while
+    streaming); each entry adds to the same totals. Regex calls count
+    against the innermost open stage.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._open = []
+
+    @contextmanager
+    def stage(self, name):
+        stats = self.stages.setdefault(name, StageStats())
+        self._open.append(stats)
+        if self.trace_memory:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        blocks = sys.getallocatedblocks()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall += time.perf_counter() - wall
+            stats.cpu += time.process_time() - cpu
+            stats.net_blocks += sys.getallocatedblocks() - blocks
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                stats.peak_kib = max(stats.peak_kib, (peak - base) / 1024)
+            stats.calls += 1
+            self._open.pop()
+
+    def count_regex(self, pattern_name):
+        if self._open:
+            regex = self._open[-1].regex
+            regex[pattern_name] = regex.get(pattern_name, 0) + 1
+
+    def as_dict(self):
+        return {name: stats.as_dict() for name, stats in self.stages.items()}
+
+    def format_table(self):
+        lines = [f"{'stage':<18} {'calls':>6} {'wall (ms)':>10} {'cpu (ms)':>10} {'net blocks':>13} "
+                 f"{'peak (KiB)':>11} {'regex':>7}"]
+        for name, stats in self.stages.items():
+            peak = f"{stats.peak_kib:>11.1f}" if self.trace_memory else f"{'-':>11}"
+            lines.append(f"{name:<18} {stats.calls:>6} {stats.wall * 1000:>10.2f} {stats.cpu * 1000:>10.2f} "
+                         f"{stats.net_blocks:>13} {peak} {sum(stats.regex.values()):>7}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"trace_memory": self.trace_memory, "stages": self.as_dict()}, f, indent=2)
+
+
+class CountingPattern:
+    """
+    Stand-in for a compiled pattern that reports each call to the active profiler
+    """
+
+    __slots__ = ("pattern", "name")
+
+    def __init__(self, pattern, name):
+        self.pattern = pattern
+        self.name = name
+
+    def _count(self):
+        if _active is not None:
+            _active.count_regex(self.name)
+
+    def match(self, *args, **kwargs):
+        self._count()
+        return self.pattern.match(*args, **kwargs)
+
+    def fullmatch(self, *args, **kwargs):
+        self._count()
+        return self.pattern.fullmatch(*args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        self._count()
+        return self.pattern.search(*args, **kwargs)
+
+    def finditer(self, *args, **kwargs):
+        self._count()
+        return self.pattern.finditer(*args, **kwargs)
+
+    def findall(self, *args, **kwargs):
+        self._count()
+        return self.pattern.findall(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.pattern, attr)
+
+
+def _pattern_modules():
+    import TriggerSystemParser
+    return (TriggerSystemParser,)
+
+
+def stage(name):
+    """
+    Context manager timing a stage, or a no-op when profiling is off
+    """
+    return _active.stage(name) if _active is not None else nullcontext()
+
+
+def enable(trace_memory=False):
+    """
+    Start profiling; module-level *_PATTERN regexes are swapped for counting proxies
+    """
+    global _active
+
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _active = Profiler(trace_memory)
+
+    for module in _pattern_modules():
+        for attr, value in list(vars(module).items()):
+            if attr.endswith("_PATTERN") and not isinstance(value, CountingPattern):
+                setattr(module, attr, CountingPattern(value, attr))
+
+    return _active
+
+
+def disable():
+    global _active
+
+    for module in _pattern_modules():
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, CountingPattern):
+                setattr(module, attr, value.pattern)
+
+    profiler, _active = _active, None
+    return profiler
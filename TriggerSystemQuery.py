@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Indexed lookups over the parsed digest: members, ancestry and descendants."""
+import argparse
+import json
+import sys
+import time
+
+import TriggerSystemSnapshot
+from TriggerSystemParser import API_FILE, MEMBER_KINDS, ClassHierarchy, open_api
+
+
+class ClassIndex:
+    """
+    Inverted indexes over a class model, built once.
+
+    Members are the ones the generators see (parameterless void methods and
+    zero-arg events), flattened over the parent chain, so a device "exposes"
+    Enable when it or any ancestor declares it.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.classes = classes = model["classes"]
+        self.device_set = model["device_set"]
+        self.hierarchy = hierarchy = ClassHierarchy(classes)
+
+        # member name -> ids of the classes exposing it
+        self.methods_index = {}
+        self.events_index = {}
+        for i, name in enumerate(classes.names):
+            for m in hierarchy.methods(name):
+                self.methods_index.setdefault(m, set()).add(i)
+            for e in hierarchy.events(name):
+                self.events_index.setdefault(e, set()).add(i)
+
+        # parent id -> ids of its direct children, from the resolved parents;
+        # a parent outside the digest is keyed by its name instead
+        self.children = {}
+        for i, (parent, record) in enumerate(zip(classes.parents, classes.records)):
+            self.children.setdefault(parent if parent >= 0 else record.parent, []).append(i)
+
+        self._descendants = {}
+
+    def key(self, name):
+        """
+        Model key of a class given by key, path or Verse-qualified name; unknown names pass through
+        """
+        i = self.classes.lookup(name)
+        return name if i < 0 else self.classes.names[i]
+
+    def _names(self, ids, devices_only):
+        names = self.classes.names
+        result = (names[i] for i in ids)
+        if devices_only:
+            result = (n for n in result if n in self.device_set)
+        return sorted(result)
+
+    def exposing(self, methods=(), events=(), devices_only=True):
+        """
+        Classes exposing every given method and event, sorted by name
+        """
+        wanted = [self.methods_index.get(m, ()) for m in methods]
+        wanted += [self.events_index.get(e, ()) for e in events]
+        if not wanted:
+            return []
+
+        # Intersect starting from the rarest member
+        wanted.sort(key=len)
+        ids = set(wanted[0])
+        for other in wanted[1:]:
+            ids &= other
+        return self._names(ids, devices_only)
+
+    def ancestors(self, name):
+        """
+        Parent chain of a class, nearest first; may end in a class outside the digest
+        """
+        name = self.key(name)
+        chain = []
+        seen = {name}
+        record = self.classes.get(name)
+        while record is not None and record.parent and record.parent not in seen:
+            chain.append(record.parent)
+            seen.add(record.parent)
+            record = self.classes.get(record.parent)
+        return chain
+
+    def descendants(self, name, devices_only=False):
+        """
+        Every class below name, sorted; name need not be defined in the digest
+        """
+        i = self.classes.lookup(name)
+        root = i if i >= 0 else name
+        ids = self._descendants.get(root)
+        if ids is None:
+            ids = set()
+            pending = list(self.children.get(root, ()))
+            while pending:
+                i = pending.pop()
+                if i not in ids:
+                    ids.add(i)
+                    pending.extend(self.children.get(i, ()))
+            self._descendants[root] = ids
+        return self._names(ids, devices_only)
+
+    def members(self, name):
+        """
+        Own and inherited members of one class, or None if it is not in the digest
+        """
+        name = self.key(name)
+        record = self.classes.get(name)
+        if record is None:
+            return None
+        info = {
+            "class": name,
+            "path": record.path,
+            "device": name in self.device_set,
+            "parent": record.parent,
+            "ancestors": self.ancestors(name),
+        }
+        for kind in MEMBER_KINDS:
+            info[kind] = list(self.hierarchy.members(kind, name))
+            info[f"own_{kind}"] = list(record[kind])
+        return info
+
+
+def load_index(digest=API_FILE):
+    data = open_api(digest)
+    if not data:
+        raise SystemExit(f"No digest found at {digest}")
+    model, _ = TriggerSystemSnapshot.load_model(data, digest)
+    return ClassIndex(model)
+
+
+def print_members(info):
+    print(f"{info['class']}{' (device)' if info['device'] else ''}")
+    print(f"  path: {info['path']}")
+    print(f"  ancestors: {' -> '.join(info['ancestors']) or '-'}")
+    for kind in MEMBER_KINDS:
+        own = set(info[f"own_{kind}"])
+        print(f"  {kind} ({len(info[kind])}):")
+        for m in info[kind]:
+            print(f"    {m}{'' if m in own else '  (inherited)'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query devices, members and inheritance in the digest.")
+    parser.add_argument("--digest", default=API_FILE, help=f"digest file (default {API_FILE})")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    # Every subcommand takes --json too; SUPPRESS keeps it from resetting one given before the subcommand
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="print the result as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exposes = sub.add_parser("exposes", parents=[output],
+                             help="devices exposing all given methods (and --event events)")
+    exposes.add_argument("methods", nargs="*", metavar="METHOD")
+    exposes.add_argument("--event", action="append", default=[], metavar="EVENT", help="required event; repeatable")
+    exposes.add_argument("--all-classes", action="store_true", help="include classes that are not devices")
+
+    members = sub.add_parser("members", parents=[output], help="own and inherited methods and events of a class")
+    members.add_argument("name", help="class name, path (/Fortnite.com/Devices/button_device) or qualified name")
+
+    descendants = sub.add_parser("descendants", parents=[output],
+                                 help="classes inheriting, directly or not, from a class")
+    descendants.add_argument("name")
+    descendants.add_argument("--devices", action="store_true", help="only list devices")
+
+    ancestors = sub.add_parser("ancestors", parents=[output], help="parent chain of a class")
+    ancestors.add_argument("name")
+
+    args = parser.parse_args(argv)
+
+    index = load_index(args.digest)
+
+    t0 = time.perf_counter()
+    if args.command == "exposes":
+        if not args.methods and not args.event:
+            parser.error("exposes needs at least one METHOD or --event")
+        result = index.exposing(args.methods, args.event, devices_only=not args.all_classes)
+    elif args.command == "members":
+        result = index.members(args.name)
+        if result is None:
+            raise SystemExit(f"Unknown class: {args.name}")
+    elif args.command == "descendants":
+        result = index.descendants(args.name, devices_only=args.devices)
+    else:
+        result = index.ancestors(args.name)
+    elapsed_us = (time.perf_counter() - t0) * 1e6
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+
+    if args.command == "members":
+        print_members(result)
+        print(f"Looked up in {elapsed_us:.0f} us", file=sys.stderr)
+        return
+
+    for name in result:
+        print(name)
+    # Timing goes to stderr so piped output stays a plain list
+    print(f"{len(result)} result(s) in {elapsed_us:.0f} us", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
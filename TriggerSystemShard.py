@@ -0,0 +1,175 @@
+"""Sharded output: one .verse file per device or per digest module, plus a shared base file."""
+import hashlib
+import json
+import os
+
+from TriggerSystemParser import pascal_module, pascal_name, split_qualname
+
+SHARD_DIR = "TriggerSystemAPI"
+SHARD_MODES = ("device", "module")
+BASE_FILE = "TriggerSystemBase.verse"
+# Lists every shard with its hash and devices; only files listed here are ever removed
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 1
+# First line of every shard. It does not name the build, so a new build leaves
+# unchanged shards alone; usage scans recognise shards by it
+SHARD_MARKER = "# Generated trigger API shard, see index.json"
+
+
+def device_module(name, record):
+    """
+    Digest module a device is defined in, e.g. /Fortnite.com/Devices
+    """
+    if record.path.startswith("/"):
+        return record.path.rsplit("/", 1)[0]
+    return split_qualname(name)[0]
+
+
+def shard_usings(kinds):
+    """
+    The using lines of every kind header, in order; each shard repeats them
+    """
+    usings = []
+    for kind, _ in kinds:
+        for line in kind.header.splitlines():
+            if line.startswith("using ") and line not in usings:
+                usings.append(line)
+    return usings
+
+
+def group_devices(classes, blacklist, by, deterministic=False, report_skipped=True):
+    """
+    {shard file name: (module, [device, ...])}, in output order
+    """
+    names = sorted(classes) if deterministic else classes
+    groups = {}
+    for name in names:
+        if name in blacklist:
+            if report_skipped:
+                print(f"Skipping blacklisted device: {name}")
+            continue
+        module = device_module(name, classes[name])
+        stem = pascal_name(name) if by == "device" else pascal_module(module) or "Root"
+        groups.setdefault(f"{stem}.verse", (module, []))[1].append(name)
+
+    if deterministic:
+        groups = dict(sorted(groups.items()))
+    return groups
+
+
+def iter_shards(model, blacklist, by, kinds, sections=None, deterministic=False, report_skipped=True):
+    """
+    Yield (file name, devices, text) per shard; devices without any section get none.
+
+    sections is a list of {device: section} matching kinds, as for the merged
+    file; without it sections are rendered here.
+    """
+    if by not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode: {by} (expected one of {', '.join(SHARD_MODES)})")
+
+    hierarchy = model["hierarchy"]
+    usings = shard_usings(kinds)
+
+    groups = group_devices(model["device_classes"], blacklist, by, deterministic, report_skipped)
+    for fname, (module, names) in groups.items():
+        parts = []
+        for i, (kind, separator) in enumerate(kinds):
+            kind_parts = []
+            for name in names:
+                if sections is not None:
+                    wrapper = sections[i].get(name)
+                else:
+                    wrapper = kind.render_device(name, hierarchy)
+                if wrapper:
+                    kind_parts.append(wrapper.strip())
+            if kind_parts:
+                # The first kind has no separator in the merged file; a blank line stands in for it
+                parts.append(separator if i else "\n\n")
+                parts.append("\n\n".join(kind_parts))
+        if not parts:
+            continue
+
+        lines = [SHARD_MARKER, ""] + usings
+        module_using = f"using {{ {module} }}"
+        if module and module_using not in lines:
+            lines.append(module_using)
+        yield fname, names, "\n".join(lines) + "".join(parts)
+
+
+def load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+    return index if index.get("format") == INDEX_FORMAT else {"files": {}}
+
+
+def shards_intact(directory):
+    """
+    True if every file listed in the index still exists with its recorded size
+    """
+    for fname, info in load_index(directory)["files"].items():
+        try:
+            if os.path.getsize(os.path.join(directory, fname)) != info["size"]:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _write_bytes(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_shards(directory, shards, build_id, by):
+    """
+    Write (file name, devices, text) shards into directory, skipping unchanged ones.
+
+    A shard is skipped when its hash matches the previous index and the
+    file still has the size written then, so unchanged shards are neither
+    rewritten nor read. Shards of the previous index that are no longer
+    generated are removed. Returns counts, total bytes and lines, and the
+    hash of the new index, which covers every shard's content.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = load_index(directory)["files"]
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "bytes": 0, "lines": 0}
+    files = {}
+
+    for fname, devices, text in shards:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(directory, fname)
+        known = previous.get(fname)
+        if known and known["hash"] == digest and os.path.exists(path) and os.path.getsize(path) == len(data):
+            stats["unchanged"] += 1
+        else:
+            _write_bytes(path, data)
+            stats["written"] += 1
+        files[fname] = {"hash": digest, "size": len(data), "devices": devices}
+        stats["bytes"] += len(data)
+        stats["lines"] += text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+    for fname in previous:
+        path = os.path.join(directory, fname)
+        if fname not in files and os.path.exists(path):
+            os.remove(path)
+            stats["removed"] += 1
+
+    index_text = json.dumps({"format": INDEX_FORMAT, "build_id": build_id, "by": by, "files": files},
+                            indent=1, sort_keys=True)
+    index_data = index_text.encode("utf-8")
+    index_path = os.path.join(directory, INDEX_FILE)
+    stats["hash"] = hashlib.sha256(index_data).hexdigest()
+    try:
+        with open(index_path, "rb") as f:
+            current = f.read()
+    except OSError:
+        current = None
+    if current != index_data:
+        _write_bytes(index_path, index_data)
+    return stats
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Binary, memory-mappable snapshots of the parsed class model."""
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+import TriggerSystemParser
+from TriggerSystemParser import (
+    API_FILE,
+    MEMBER_KINDS,
+    ClassModel,
+    build_tag,
+    extract_build_id,
+    extract_classes,
+    extract_classes_parallel,
+    model_from_classes,
+    open_api,
+)
+from TriggerSystemProfile import stage
+
+# Bump whenever the layout below changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 4
+SNAPSHOT_MAGIC = b"TSNP"
+
+# Layout, little-endian, every table 4-byte aligned:
+#   header   magic, version, key (sha256), build id string, string/class/member counts
+#   offsets  u32 * (strings + 1)  start of each string in the blob
+#   classes  u32 * 9 * classes    name, parent, path, first member, one count per MEMBER_KINDS kind
+#   members  u32 * members        string index of each member, kind by kind, per class
+#   blob     utf-8 bytes of all strings
+HEADER = struct.Struct("<4sI32sIIII")
+CLASS_FIELDS = 4 + len(MEMBER_KINDS)
+MISSING_ID = 0xFFFFFFFF
+
+_parser_source = None
+
+
+def snapshot_key(data) -> bytes:
+    """
+    sha256 over the parser source and the digest; a parser change invalidates snapshots
+    """
+    global _parser_source
+
+    if _parser_source is None:
+        with open(TriggerSystemParser.__file__, "rb") as f:
+            _parser_source = f.read()
+
+    h = hashlib.sha256(_parser_source)
+    h.update(TriggerSystemParser.as_bytes(data))
+    return h.digest()
+
+
+def snapshot_path(digest_path, build_id):
+    return f"{digest_path}.{build_tag(build_id)}.snapshot"
+
+
+def _u32(values):
+    table = array("I", values)
+    if sys.byteorder == "big":
+        table.byteswap()
+    return table.tobytes()
+
+
+def _table(buf, offset, count):
+    view = buf[offset:offset + count * 4]
+    if sys.byteorder == "little":
+        return view.cast("I")
+    # Big-endian hosts pay for one copy
+    table = array("I", view)
+    table.byteswap()
+    return table
+
+
+def write_snapshot(path, classes, build_id, key):
+    """
+    Write classes ({name: {"parent", "path", "methods", ...}}) atomically to path
+    """
+    strings = {}
+
+    def intern(s):
+        index = strings.get(s)
+        if index is None:
+            index = strings[s] = len(strings)
+        return index
+
+    build_index = intern(build_id)
+    class_table = []
+    members = []
+    for name, entry in classes.items():
+        kinds = [entry[kind] for kind in MEMBER_KINDS]
+        class_table += (intern(name), intern(entry["parent"]), intern(entry["path"]), len(members))
+        class_table += (len(names) for names in kinds)
+        for names in kinds:
+            members += (intern(m) for m in names)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, key, build_index,
+                            len(encoded), len(classes), len(members)))
+        f.write(_u32(offsets))
+        f.write(_u32(class_table))
+        f.write(_u32(members))
+        f.write(b"".join(encoded))
+    os.replace(tmp, path)
+
+
+class SnapshotRecord(Mapping):
+    """
+    One class of a snapshot, read like {"parent", "path", "methods", ...}.
+
+    Member names are looked up in the string table on first access.
+    """
+
+    __slots__ = ("parent", "path", "_snapshot", "_index", "_members")
+
+    KEYS = ("parent", "path") + MEMBER_KINDS
+
+    def __init__(self, parent, path, snapshot, index):
+        self.parent = parent
+        self.path = path
+        self._snapshot = snapshot
+        self._index = index
+        self._members = None
+
+    def _load(self):
+        if self._members is None:
+            snap = self._snapshot
+            base = self._index * CLASS_FIELDS
+            start = snap.class_table[base + 3]
+            self._members = {}
+            for kind, count in zip(MEMBER_KINDS, snap.class_table[base + 4:base + CLASS_FIELDS]):
+                self._members[kind] = tuple(snap.strings[i] for i in snap.members[start:start + count])
+                start += count
+        return self._members
+
+    def __getitem__(self, key):
+        if key == "parent":
+            return self.parent
+        if key == "path":
+            return self.path
+        if key in MEMBER_KINDS:
+            return self._load()[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"SnapshotRecord({dict(self)!r})"
+
+    def same_members(self, other):
+        """
+        True if other, a record of any snapshot, lists the same members of
+        every kind; compares raw string ids and decodes no member names
+        """
+        snap, other_snap = self._snapshot, other._snapshot
+        base, other_base = self._index * CLASS_FIELDS, other._index * CLASS_FIELDS
+        table, other_table = snap.class_table, other_snap.class_table
+        counts = table[base + 4:base + CLASS_FIELDS]
+        if counts != other_table[other_base + 4:other_base + CLASS_FIELDS]:
+            return False
+        start, other_start, size = table[base + 3] * 4, other_table[other_base + 3] * 4, sum(counts) * 4
+        ids = snap.member_bytes(other_snap)
+        return ids[start:start + size] == other_snap.member_bytes()[other_start:other_start + size]
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot; tables are views into the mapping, not copies
+    """
+
+    def __init__(self, buf):
+        magic, version, key, build_index, n_strings, n_classes, n_members = HEADER.unpack_from(buf)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a current class model snapshot")
+
+        self.key = key
+        offset = HEADER.size
+        offsets = _table(buf, offset, n_strings + 1)
+        offset += (n_strings + 1) * 4
+        self.class_table = _table(buf, offset, n_classes * CLASS_FIELDS)
+        offset += n_classes * CLASS_FIELDS * 4
+        self.members = _table(buf, offset, n_members)
+        offset += n_members * 4
+
+        blob = buf[offset:]
+        if len(blob) != offsets[-1]:
+            raise ValueError("truncated class model snapshot")
+        # Names are short and shared by many classes; decode and intern each once
+        self.strings = [sys.intern(str(blob[offsets[i]:offsets[i + 1]], "utf-8")) for i in range(n_strings)]
+        self.build_id = self.strings[build_index]
+        self._translated = (None, None)
+        self._member_bytes = None
+
+    def member_bytes(self, other=None):
+        """
+        The member table as native-order u32 bytes; with other, its string
+        ids are first translated to other's ids for the same strings, so
+        equal slices mean equal member names. Both are built once.
+        """
+        if other is None or other is self:
+            if self._member_bytes is None:
+                self._member_bytes = array("I", self.members).tobytes()
+            return self._member_bytes
+
+        target, translated = self._translated
+        if target is not other:
+            ids = {s: i for i, s in enumerate(other.strings)}
+            # Strings other lacks map to an id no table holds
+            remap = [ids.get(s, MISSING_ID) for s in self.strings]
+            translated = array("I", map(remap.__getitem__, self.members)).tobytes()
+            self._translated = (other, translated)
+        return translated
+
+    def classes(self):
+        strings = self.strings
+        table = self.class_table
+        count = len(table) // CLASS_FIELDS
+        names = [strings[table[i * CLASS_FIELDS]] for i in range(count)]
+        records = [SnapshotRecord(strings[table[i * CLASS_FIELDS + 1]], strings[table[i * CLASS_FIELDS + 2]], self, i)
+                   for i in range(count)]
+        return ClassModel(names, records)
+
+
+def read_snapshot(path, key=None):
+    """
+    Map a snapshot file; None if it is missing, damaged, outdated or for another key
+    """
+    try:
+        with open(path, "rb") as f:
+            buf = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        snapshot = Snapshot(buf)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if key is not None and snapshot.key != key:
+        return None
+    return snapshot
+
+
+def prune_snapshots(digest_path, keep):
+    """
+    Remove older snapshots of the same digest file
+    """
+    for path in glob.glob(glob.escape(digest_path) + ".*.snapshot"):
+        if path != keep:
+            os.remove(path)
+
+
+def load_classes(data, digest_path=API_FILE, jobs=1, write=True):
+    """
+    Classes of a digest from its snapshot, parsing and snapshotting them on a miss.
+
+    Returns (classes, build_id, hit); no devices or hierarchy are derived.
+    """
+    with stage("snapshot"):
+        build_id = extract_build_id(data)
+        key = snapshot_key(data)
+        path = snapshot_path(digest_path, build_id)
+        snapshot = read_snapshot(path, key)
+
+    if snapshot is not None:
+        return snapshot.classes(), snapshot.build_id, True
+
+    with stage("extract_classes"):
+        classes = extract_classes_parallel(data, jobs) if jobs > 1 else extract_classes(data)
+    if write:
+        with stage("snapshot"):
+            write_snapshot(path, classes, build_id, key)
+            prune_snapshots(digest_path, path)
+
+    return classes, build_id, False
+
+
+def load_model(data, digest_path=API_FILE, jobs=1, write=True):
+    """
+    Class model of a digest from its snapshot, parsing and snapshotting it on a miss.
+
+    Returns (model, hit).
+    """
+    classes, build_id, hit = load_classes(data, digest_path, jobs, write)
+    return model_from_classes(classes, build_id), hit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write or inspect the class model snapshot of a digest.")
+    parser.add_argument("digest", nargs="?", default=API_FILE, help=f"digest file (default {API_FILE})")
+    parser.add_argument("--force", action="store_true", help="rewrite the snapshot even if it is current")
+    args = parser.parse_args(argv)
+
+    data = open_api(args.digest)
+    if not data:
+        raise SystemExit(f"No digest found at {os.path.abspath(args.digest)}")
+
+    path = snapshot_path(args.digest, extract_build_id(data))
+    if args.force and os.path.exists(path):
+        os.remove(path)
+
+    model, hit = load_model(data, args.digest)
+    state = "current" if hit else "written"
+    print(f"Snapshot {state}: {os.path.abspath(path)}")
+    print(f"{len(model['classes'])} classes, {len(model['devices'])} devices, {os.path.getsize(path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Declarative wrapper templates, compiled once into per-device render functions."""
+import hashlib
+import keyword
+import string
+
+from TriggerSystemParser import MEMBER_KINDS, ClassHierarchy, generation_timestamp, pascal_name
+
+# Fields every template can use; `member` is only bound inside list templates
+BUILTIN_FIELDS = ("name", "pascal", "default")
+RESERVED_NAMES = BUILTIN_FIELDS + ("member", "members", "pascal_name")
+
+# name -> kind, and name -> (order, separator, batched) placing it in merged files
+WRAPPER_KINDS = {}
+MERGE_LAYOUT = {}
+
+_formatter = string.Formatter()
+
+
+class WrapperKind:
+    """
+    One wrapper shape, e.g. the input listeners or the output triggers.
+
+    `members` names the MEMBER_KINDS list that feeds it ("events",
+    "agent_methods", ...); devices without such members get no section.
+    Only those lists can feed a kind: members classify_body does not keep,
+    such as methods with parameters, need a MEMBER_KINDS entry first. `fields`
+    derive per-device names from the builtin fields, in order. `lists`
+    render one line per member and join them with their separator, which
+    is where trailing commas are handled. `section` is the text of one
+    device and `header` the static text above all sections.
+
+    Templates use str.format syntax without format specs or conversions.
+    """
+
+    def __init__(self, name, members, header, section, fields=None, lists=None):
+        if members not in MEMBER_KINDS:
+            raise ValueError(f"{name}: unknown member kind {members!r} (expected one of {', '.join(MEMBER_KINDS)})")
+        self.name = name
+        self.members = members
+        self.header = header
+        self.section = section
+        self.fields = dict(fields or {})
+        self.lists = dict(lists or {})
+        self.source, self.render, self.render_device = compile_kind(self)
+        # Changes with any template, so cached sections of a kind registered outside the generator go stale too
+        self.fingerprint = hashlib.sha256(f"{self.source}\0{self.header}".encode("utf-8")).hexdigest()[:16]
+
+    def __repr__(self):
+        return f"WrapperKind({self.name!r})"
+
+
+def _expression(template, known, where):
+    """
+    Python f-string expression equivalent to one template over the local fields
+    """
+    text = []
+    for literal, field, spec, conversion in _formatter.parse(template):
+        text.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if spec or conversion:
+            raise ValueError(f"{where}: format specs are not supported in {{{field}}}")
+        if field not in known:
+            raise ValueError(f"{where}: unknown field {{{field}}}")
+        text.append(f"{{{field}}}")
+
+    # repr() escapes quotes and newlines; the braces are all f-string syntax by now
+    return "f" + repr("".join(text))
+
+
+def _check_name(field, known, where):
+    if not field.isidentifier() or keyword.iskeyword(field) or field.startswith("_"):
+        raise ValueError(f"{where}: {field!r} is not a valid field name")
+    if field in known or field in RESERVED_NAMES:
+        raise ValueError(f"{where}: field {field!r} is already defined")
+
+
+def compile_kind(kind):
+    """
+    Generate and compile the render functions of a wrapper kind.
+
+    Returns (source, render, render_device): render(name, members) returns
+    the section text, or None when members is empty; render_device(name,
+    hierarchy) looks the members up first.
+    """
+    known = set(BUILTIN_FIELDS)
+    body = [
+        "    if not members:",
+        "        return None",
+        "    pascal = pascal_name(name)",
+        "    default = members[0]",
+    ]
+
+    for field, template in kind.fields.items():
+        where = f"{kind.name}.fields.{field}"
+        _check_name(field, known, where)
+        body.append(f"    {field} = {_expression(template, known, where)}")
+        known.add(field)
+
+    for field, (template, separator) in kind.lists.items():
+        where = f"{kind.name}.lists.{field}"
+        _check_name(field, known, where)
+        item = _expression(template, known | {"member"}, where)
+        body.append(f"    {field} = {separator!r}.join([{item} for member in members])")
+        known.add(field)
+
+    body.append(f"    return {_expression(kind.section, known, f'{kind.name}.section')}")
+
+    # Both entry points share one body so rendering from a hierarchy costs no extra call
+    source = "\n".join(
+        ["def render(name, members):"] + body
+        + ["", "", "def render_device(name, hierarchy):", f"    members = hierarchy.members({kind.members!r}, name)"] + body
+    ) + "\n"
+
+    namespace = {"pascal_name": pascal_name}
+    exec(compile(source, f"<wrapper {kind.name}>", "exec"), namespace)
+    return source, namespace["render"], namespace["render_device"]
+
+
+def register(kind, order, separator=None, batched=False, replace=False):
+    """
+    Make a wrapper kind available by name and place it in the merged output.
+
+    Merged files and shards write every registered kind in ascending order,
+    each part after its separator (the first part needs none); batched kinds
+    are only written with --batched. Built-in kinds register on import.
+    """
+    if kind.name in WRAPPER_KINDS and not replace:
+        raise ValueError(f"Wrapper kind already registered: {kind.name}")
+    if separator is None:
+        separator = f"\n\n# === {kind.name.replace('_', ' ').upper()} API ===\n\n"
+    WRAPPER_KINDS[kind.name] = kind
+    MERGE_LAYOUT[kind.name] = (order, separator, batched)
+    return kind
+
+
+def layout_kinds(batched=False):
+    """
+    (kind, separator) of the registered kinds in merged-file order; batched ones only if asked for
+    """
+    names = sorted((name for name, (_, _, is_batched) in MERGE_LAYOUT.items() if batched or not is_batched),
+                   key=lambda name: MERGE_LAYOUT[name][0])
+    return tuple((WRAPPER_KINDS[name], MERGE_LAYOUT[name][1]) for name in names)
+
+
+def get_kind(name):
+    try:
+        return WRAPPER_KINDS[name]
+    except KeyError:
+        raise KeyError(f"Unknown wrapper kind: {name} (registered: {', '.join(sorted(WRAPPER_KINDS))})") from None
+
+
+def fancy_header(build_id, deterministic=False):
+    generated_on = generation_timestamp(deterministic)
+    fancy_lines = [
+        "# ==================================",
+        f"#  Generated from API build: {build_id}",
+    ]
+    if generated_on:
+        fancy_lines.append(f"#  Generated on: {generated_on}")
+    fancy_lines.append("# ==================================")
+    return "\n".join(fancy_lines) + "\n"
+
+
+def iter_wrapper(kind, classes, blacklist, build_id=None, hierarchy=None, sections=None, deterministic=False,
+                 report_skipped=True):
+    """
+    Yield the parts of one kind's wrapper file one at a time, to be joined by newlines
+    """
+    if hierarchy is None:
+        hierarchy = ClassHierarchy(classes)
+
+    # If a build id was provided, include a fancy header
+    if build_id:
+        yield fancy_header(build_id, deterministic)
+
+    yield kind.header
+
+    # Deterministic output does not depend on the class order inside the digest
+    names = sorted(classes) if deterministic else classes
+    render = kind.render_device
+
+    for name in names:
+
+        if name in blacklist:
+            if report_skipped:
+                print(f"Skipping blacklisted device: {name}")
+            continue
+
+        if sections is not None:
+            wrapper = sections.get(name)
+        else:
+            wrapper = render(name, hierarchy)
+
+        if wrapper:
+            yield wrapper
+
+
+def render_sections(kind, classes, hierarchy):
+    """
+    Render every device section of one kind up front, keyed by class name
+    """
+    render = kind.render_device
+    return {name: render(name, hierarchy) for name in classes}
+
+
+def iter_generate(kind, model, blacklist, sections=None, deterministic=False, report_skipped=True,
+                  build_id=None):
+    """
+    iter_wrapper over a model; merged output passes no build_id and writes the banner once itself
+    """
+    return iter_wrapper(
+        kind,
+        model["device_classes"],
+        blacklist,
+        build_id=build_id,
+        hierarchy=model["hierarchy"],
+        sections=sections,
+        deterministic=deterministic,
+        report_skipped=report_skipped,
+    )
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Scan a project's .verse sources for the devices it uses, for tree-shaken output."""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import TriggerSystemSnapshot
+from TriggerSystemCache import CACHE_DIR
+from TriggerSystemParser import API_FILE, open_api, pascal_name, simple_name
+from TriggerSystemShard import SHARD_MARKER
+
+# Bump whenever the index layout or the matching rules below change
+USAGE_FORMAT = 2
+USAGE_DIR = os.path.join(CACHE_DIR, "usage")
+
+# Maps every byte that cannot be part of an identifier to a space, so that
+# splitting a file yields its identifiers (and numbers) without a regex pass
+_IDENTIFIER_BYTES = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_")
+_SPLIT_TABLE = bytes(c if c in _IDENTIFIER_BYTES else 0x20 for c in range(256))
+
+# Generated API files and shards declare wrappers; scanning them would keep everything.
+# Their header, marker or base classes come within the first lines, so only the head is searched.
+GENERATED_PATTERN = re.compile(
+    rb"^(?:#  Generated from API build:|" + re.escape(SHARD_MARKER.encode("utf-8"))
+    + rb"|trigger_(?:input|output)_system(?:<public>)? := class)", re.M)
+GENERATED_HEAD = 4096
+
+# Directories that never hold project sources
+SKIP_DIRS = frozenset(("__pycache__", "node_modules", "Intermediate", "Saved", "Binaries"))
+
+
+def index_path(root, index_dir=USAGE_DIR):
+    """
+    Index file of one project tree, kept next to the regeneration cache
+    """
+    tag = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir, f"{tag}.json")
+
+
+def iter_sources(root):
+    """
+    Yield (relative path, DirEntry) of every .verse file below root, skipping hidden directories
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith(".") and entry.name not in SKIP_DIRS:
+                        pending.append(entry.path)
+                elif entry.name.endswith(".verse") and entry.is_file():
+                    yield os.path.relpath(entry.path, root), entry
+
+
+def scan_source(data):
+    """
+    Sorted identifiers of one source file; none for generated API files
+    """
+    if GENERATED_PATTERN.search(data, 0, GENERATED_HEAD):
+        return None
+    words = set(data.translate(_SPLIT_TABLE).split())
+    return sorted(w.decode("ascii") for w in words if not w[:1].isdigit())
+
+
+class UsageIndex:
+    """
+    Identifiers per .verse file of a project, keyed on a file-hash index.
+
+    A file whose size and mtime are unchanged is not read again; one that
+    was touched but hashes the same keeps its identifiers, so a rescan only
+    tokenizes files whose content actually changed.
+    """
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or index_path(root)
+        self.files = {}
+        # Whether the index on disk lags behind self.files
+        self.stale = True
+
+    @classmethod
+    def load(cls, root, path=None):
+        index = cls(root, path)
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("format") == USAGE_FORMAT and data.get("root") == os.path.abspath(root):
+            index.files = data["files"]
+            index.stale = False
+        return index
+
+    def scan(self):
+        """
+        Bring the index up to date with the tree; returns the number of files read again
+        """
+        if not os.path.isdir(self.root):
+            raise SystemExit(f"No project directory at {os.path.abspath(self.root)}")
+
+        files = {}
+        rescanned = 0
+        restated = 0
+        for rel, entry in iter_sources(self.root):
+            stat = entry.stat()
+            known = self.files.get(rel)
+            if known and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                files[rel] = known
+                continue
+
+            restated += 1
+            with open(entry.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if known and known["hash"] == digest:
+                tokens = known["tokens"]
+            else:
+                tokens = scan_source(data)
+                rescanned += 1
+            files[rel] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": digest, "tokens": tokens}
+
+        # Deleted files only show up as a shorter index
+        if restated or len(files) != len(self.files):
+            self.stale = True
+        self.files = files
+        return rescanned
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": USAGE_FORMAT, "root": os.path.abspath(self.root), "files": self.files}, f)
+        os.replace(tmp, self.path)
+        self.stale = False
+
+    def sources(self):
+        """
+        Relative paths of the scanned project sources, generated API files excluded
+        """
+        return sorted(rel for rel, info in self.files.items() if info["tokens"] is not None)
+
+    def tokens(self):
+        """
+        Every identifier used anywhere in the project sources
+        """
+        tokens = set()
+        for info in self.files.values():
+            if info["tokens"]:
+                tokens.update(info["tokens"])
+        return tokens
+
+    def fingerprint(self):
+        """
+        Hash of the scanned sources; any edit to them changes it
+        """
+        h = hashlib.sha256(f"usage-format-{USAGE_FORMAT}".encode("utf-8"))
+        for rel in self.sources():
+            h.update(f"\0{rel}\0{self.files[rel]['hash']}".encode("utf-8"))
+        return h.hexdigest()
+
+
+def used_devices(model, tokens):
+    """
+    Devices the identifiers refer to, by type name (button_device) or by the
+    name of one of their wrappers (ButtonDevice, ButtonDevice_Listener, ...)
+    """
+    by_name = {}
+    by_pascal = {}
+    for name in model["device_classes"]:
+        # A bare type name matches every device sharing it; the project may import either
+        simple = simple_name(name)
+        by_name.setdefault(simple, []).append(name)
+        if simple != name:
+            by_name.setdefault(name, []).append(name)
+        by_pascal[pascal_name(name)] = name
+
+    used = set()
+    for token in tokens:
+        names = by_name.get(token)
+        if names:
+            used.update(names)
+            continue
+
+        # Wrapper names are the device's PascalCase name plus an optional _Suffix;
+        # qualified PascalCase names contain underscores themselves, so try every prefix
+        name = by_pascal.get(token)
+        end = token.find("_", 1)
+        while name is None and end > 0:
+            name = by_pascal.get(token[:end])
+            end = token.find("_", end + 1)
+        if name is not None:
+            used.add(name)
+
+    return used
+
+
+def shake_model(model, used):
+    """
+    Model whose devices are only the used ones; the headers with the base
+    classes are static and stay in every part, so they are always emitted
+    """
+    classes = model["device_classes"]
+    return dict(model, device_classes=classes.subset(name for name in classes.names if name in used))
+
+
+def measure(chunks):
+    """
+    (bytes, lines) of the text the chunks join to
+    """
+    size = 0
+    newlines = 0
+    last = ""
+    for chunk in chunks:
+        if chunk:
+            size += len(chunk.encode("utf-8"))
+            newlines += chunk.count("\n")
+            last = chunk
+    return size, newlines + (1 if last and not last.endswith("\n") else 0)
+
+
+def reduction(full, shaken):
+    return 100.0 * (full - shaken) / full if full else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the devices a project's .verse sources use.")
+    parser.add_argument("project", help="directory holding the project's .verse files")
+    parser.add_argument("--digest", default=API_FILE, help=f"digest file (default {API_FILE})")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    index = UsageIndex.load(args.project)
+    rescanned = index.scan()
+    if index.stale:
+        index.save()
+    elapsed_ms = (time.perf_counter() - t0) * 1e3
+    print(f"Scanned {len(index.files)} file(s), {rescanned} changed, in {elapsed_ms:.1f} ms")
+
+    data = open_api(args.digest)
+    if not data:
+        raise SystemExit(f"No digest found at {args.digest}")
+    model, _ = TriggerSystemSnapshot.load_model(data, args.digest)
+
+    used = used_devices(model, index.tokens())
+    for name in sorted(used):
+        print(name)
+    print(f"{len(used)} of {len(model['device_classes'])} device(s) used")
+
+
+if __name__ == "__main__":
+    main()
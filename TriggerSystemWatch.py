@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Keep the parsed digest warm and regenerate the merged API whenever inputs change."""
+import argparse
+import os
+import time
+
+from GenerateCompleteAPI import MERGED_FILE, check_environment, stream_to_file
+from TriggerSystemDiff import affected_devices
+from TriggerSystemMerge import iter_merged, iter_model_parts, merged_kinds
+from TriggerSystemParser import API_FILE, BLACKLIST_FILE, build_model, load_blacklist, read_api
+
+POLL_INTERVAL = 0.2
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ApiWatcher:
+    """
+    Polls the digest and blacklist and rewrites the merged API on change.
+
+    The class model, hierarchy index and rendered device sections stay in
+    memory between changes; a blacklist edit only re-filters the sections
+    and a digest edit re-renders just the devices whose members changed.
+    """
+
+    def __init__(self, api_file=API_FILE, blacklist_file=BLACKLIST_FILE, merged_file=MERGED_FILE,
+                 deterministic=False, batched=False):
+        self.api_file = api_file
+        self.blacklist_file = blacklist_file
+        self.merged_file = merged_file
+        self.deterministic = deterministic
+        self.kinds = merged_kinds(batched)
+        self.signatures = {}
+        self.model = None
+        self.blacklist = set()
+        # One {device name: section} dict per merged wrapper kind
+        self.sections = [{} for _ in self.kinds]
+
+    def load_digest(self):
+        # Not memory-mapped: the model lives as long as the watcher, and a mapping
+        # would keep the digest from being replaced while it runs
+        model = build_model(read_api(self.api_file))
+
+        for (kind, _), sections in zip(self.kinds, self.sections):
+            if self.model is None:
+                stale = model["device_set"]
+            else:
+                stale = affected_devices(self.model, model, kind.members)
+            for name in list(sections):
+                if name not in model["device_set"]:
+                    del sections[name]
+            for name in model["device_classes"]:
+                if name in stale or name not in sections:
+                    sections[name] = kind.render_device(name, model["hierarchy"])
+
+        self.model = model
+
+    def write(self):
+        parts = iter_model_parts(self.model, self.blacklist, self.sections, self.deterministic, self.kinds)
+        merged = iter_merged(*parts, kinds=self.kinds, build_id=self.model["build_id"],
+                             deterministic=self.deterministic)
+        written, _ = stream_to_file(self.merged_file, merged)
+        return written
+
+    def changed_inputs(self):
+        changed = []
+        for path in (self.api_file, self.blacklist_file):
+            sig = file_signature(path)
+            if self.signatures.get(path, False) != sig:
+                self.signatures[path] = sig
+                changed.append(path)
+        return changed
+
+    def poll(self):
+        """
+        Regenerate if an input changed since the last poll; returns the changed paths
+        """
+        changed = self.changed_inputs()
+        if not changed:
+            return changed
+
+        t0 = time.perf_counter()
+        initial = self.model is None
+        if self.api_file in changed or initial:
+            self.load_digest()
+        if self.blacklist_file in changed:
+            self.blacklist = load_blacklist()
+        written = self.write()
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        # Latency from the newest input modification until the file is on disk
+        newest = max((sig[0] for sig in (self.signatures.get(p) for p in changed) if sig), default=None)
+        since_change = ""
+        if newest and not initial:
+            since_change = f", {(time.time_ns() - newest) / 1e6:.1f} ms since change"
+        state = "written" if written else "unchanged"
+        names = ", ".join(os.path.basename(p) for p in changed)
+        print(f"[watch] {names} -> {self.merged_file} {state} in {elapsed_ms:.1f} ms{since_change}")
+        return changed
+
+    def run(self, interval=POLL_INTERVAL):
+        print(f"[watch] Watching {self.api_file} and {self.blacklist_file} (Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("[watch] Stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate the merged API whenever the digest or blacklist change.")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="poll interval in seconds")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-stable output: sorted devices, timestamp only from SOURCE_DATE_EPOCH")
+    parser.add_argument("--batched", action="store_true",
+                        help="also emit array-target output triggers and fan-in input listeners")
+    args = parser.parse_args(argv)
+    check_environment()
+
+    ApiWatcher(deterministic=args.deterministic, batched=args.batched).run(args.interval)
+
+
+if __name__ == "__main__":
+    main()